@@ -13,21 +13,55 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date, timedelta
 from pathlib import Path
+import hashlib
 import io
-
-from db import get_hotels, get_suppliers, get_hotel_rates, get_meal_types, get_room_types_by_hotel, test_connection
+import json
+
+from db import (
+    get_hotels,
+    get_suppliers,
+    get_meal_types,
+    get_room_types_for_hotels,
+    get_gap_intervals,
+    get_existing_rate_keys,
+    get_pool_stats,
+    test_connection,
+)
 from gap_analyzer import (
-    rates_to_dataframe,
-    expand_date_ranges,
-    generate_all_hotel_gaps,
+    gaps_to_dataframe,
+    CoverageIndex,
+    patch_hotel_gaps,
     get_supplier_summary,
     prepare_csv_export_template,
+    gaps_fingerprint,
+    gap_report_key,
+)
+from gap_rules import (
+    ExclusionSet,
     BOARD_EQUIVALENTS,
     REQUIRED_OCCUPANCIES,
     OCCUPANCY_CODES,
     BOARD_TO_MEAL_CODE,
 )
-from graphql_client import insert_hotel_rate, test_hasura_connection
+from rates_schema import rates_to_dataframe
+from graphql_client import get_hasura_metrics, insert_hotel_rate, insert_hotel_rates, test_hasura_connection
+from rate_store import RateStore
+from snapshot import SnapshotStore
+from gap_store import GapStore, find_gap_preset, preset_window
+from cache import cached, get_cache, get_cache_stats, invalidate as invalidate_cache
+from excel_template import (
+    RATE_TYPES,
+    build_rate_template,
+    mark_existing_rates,
+    rate_insert_rows,
+    rate_keys,
+    read_rate_template,
+    template_hotel_ids,
+    validate_rate_rows,
+)
+from gap_density import GapDensity
+from health import HealthMonitor
+from worker import GapMaterializer
 
 # Page config
 st.set_page_config(
@@ -39,37 +73,109 @@ st.set_page_config(
 
 
 # Cached data loaders - fetch once, filter client-side
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    """On-disk snapshots used to serve data right after a restart."""
+    return SnapshotStore()
+
+
+# Reference data lives in the shared TTL cache (see cache.py); "Refresh Data" invalidates all of it
+@cached("hotels", ttl=3600)
 def load_all_hotels():
-    """Load all hotels from DB (cached)."""
-    return get_hotels()
+    """Load all hotels from DB (cached, from the snapshot right after a restart)."""
+    return get_snapshot_store().records("hotels", get_hotels, on_change=load_all_hotels.cache.invalidate)
 
 
-@st.cache_data(show_spinner=False)
+@cached("suppliers", ttl=3600)
 def load_all_suppliers():
-    """Load all suppliers from DB (cached)."""
-    return get_suppliers()
+    """Load all suppliers from DB (cached, from the snapshot right after a restart)."""
+    return get_snapshot_store().records("suppliers", get_suppliers, on_change=load_all_suppliers.cache.invalidate)
+
+
+@st.cache_resource(show_spinner=False)
+def get_health_monitor():
+    """Process-wide backend health checks; pages read the cached status instead of probing."""
+    monitor = HealthMonitor({"database": test_connection, "hasura": test_hasura_connection})
+    monitor.start()
+    return monitor
+
+
+@st.cache_resource(show_spinner=False)
+def get_gap_store():
+    """Preset gap reports, materialized by get_gap_materializer."""
+    return GapStore(get_snapshot_store())
+
+
+@st.cache_resource(show_spinner=False)
+def get_gap_materializer():
+    """Background thread keeping the preset gap reports in step with the loaded rates."""
+    # It only compares the loaded rates version, so checking often costs nothing
+    materializer = GapMaterializer(get_rate_store(), get_gap_store(), interval=60)
+    materializer.start()
+    return materializer
+
+
+@st.cache_resource(show_spinner=False)
+def get_rate_store():
+    """Process-wide rates store, shared across sessions and delta-synced on refresh."""
+    return RateStore(snapshots=get_snapshot_store())
 
 
-@st.cache_data(show_spinner=False)
 def load_all_rates():
-    """Load all rates from DB (cached). Returns Polars DataFrame."""
-    rates = get_hotel_rates()
-    if not rates:
-        return pl.DataFrame()
-    return rates_to_dataframe(rates)
+    """
+    Load all rates from the rate store.
 
+    Returns:
+        (Polars DataFrame, version) taken together, so a sync finishing later
+        in the rerun can't pair this frame with a newer version
+    """
+    rate_store = get_rate_store()
+    rate_store.load()
+    return rate_store.current()
 
-@st.cache_data(show_spinner=False)
+
+@cached("meal_types", ttl=24 * 3600)
 def load_all_meal_types():
     """Load all meal types from DB (cached)."""
     return get_meal_types()
 
 
-@st.cache_data(show_spinner=False)
-def load_room_types_for_hotel(hotel_id: str):
-    """Load room types for a specific hotel (cached)."""
-    return get_room_types_by_hotel(hotel_id)
+@cached("room_types", ttl=3600, max_entries=64)
+def load_room_types_for_hotels(hotel_ids: tuple):
+    """Load room types for a set of hotels in one query (cached). Returns hotel_id -> room types."""
+    return get_room_types_for_hotels(list(hotel_ids))
+
+
+def gap_hotel_ids(gaps_df: pl.DataFrame) -> tuple:
+    """Sorted hotel IDs in a gap report, used as the shared room type cache key."""
+    return tuple(sorted(gaps_df["hotel_id"].unique().to_list()))
+
+
+def reference_fingerprint(*datasets) -> str:
+    """Content hash of reference data lists/dicts, so outputs built from them follow their refreshes."""
+    return hashlib.md5(json.dumps(datasets, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_rate_template(template_key, _gaps_df, _room_types, _suppliers, _meal_types):
+    """Build the Excel rate template for a gap report (cached per gaps_df and reference data hash)."""
+    return build_rate_template(_gaps_df, _room_types, _suppliers, _meal_types)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def load_gap_density(gaps_key, _gaps_df):
+    """Build the Visualizations tab gap counts for a gap report (cached per gaps_df hash)."""
+    return GapDensity.from_gaps(_gaps_df)
+
+
+# Gap reports by gap_report_key, shared across sessions
+gap_reports = get_cache("gap_reports", ttl=3600, max_entries=32)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def load_coverage_index(_rates_df, start_date, end_date, filters_key):
+    """Build the day-bitmap coverage index for the filtered rates (cached per window and filters)."""
+    return CoverageIndex.from_rates(_rates_df, start_date, end_date)
 
 
 def load_auth_config():
@@ -109,8 +215,10 @@ def main_dashboard():
     """Main dashboard content (shown after authentication)."""
     st.title("🏨 Hotel Gap Analysis")
 
-    # Test database connection
-    if not test_connection():
+    # Database health comes from the background monitor, not a probe per rerun
+    health = get_health_monitor()
+    if health.status("database")["ok"] is False:
+        health.request_check()
         st.error("Cannot connect to database. Please check DATABASE_URL in .env file.")
         st.stop()
 
@@ -119,23 +227,46 @@ def main_dashboard():
 
     # Refresh data button
     st.sidebar.subheader("Data")
-    if st.sidebar.button("🔄 Refresh Data", help="Clear cache and reload from database"):
-        load_all_hotels.clear()
-        load_all_suppliers.clear()
-        load_all_rates.clear()
+    if st.sidebar.button("🔄 Refresh Data", help="Clear reference data cache and sync changed rates from database"):
+        invalidate_cache()
+        get_rate_store().sync()
+        get_gap_materializer().request_run()
+        load_coverage_index.clear()
+        st.session_state.created_rates = []
+        # The report counted those pending rates; don't patch it with frames that lack them
+        st.session_state.pop("gap_report_filters", None)
         st.rerun()
 
     # Load cached data
     with st.spinner("Loading data from database..."):
         all_hotels = load_all_hotels()
         all_suppliers = load_all_suppliers()
-        all_rates_df = load_all_rates()
+        all_rates_df, rates_version = load_all_rates()
+    get_gap_materializer()
+
+    # Rates created from the Fill Gaps tab this session, patched into the cached frame
+    if "created_rates" not in st.session_state:
+        st.session_state.created_rates = []
+    if st.session_state.created_rates:
+        all_rates_df = pl.concat(
+            [all_rates_df, rates_to_dataframe(st.session_state.created_rates)],
+            how="diagonal_relaxed",
+        )
 
     if len(all_rates_df) == 0:
         st.warning("No rates found in database.")
         return
 
     st.sidebar.success("Data cached")
+    rate_store = get_rate_store()
+    if rate_store.last_sync:
+        st.sidebar.caption(
+            f"Last sync {rate_store.last_sync.strftime('%H:%M:%S')}: "
+            f"{rate_store.last_delta['changed']} changed, {rate_store.last_delta['removed']} removed "
+            f"hotel/supplier groups"
+        )
+    elif rate_store.snapshot_at:
+        st.sidebar.caption(f"Rates from snapshot saved {rate_store.snapshot_at}, revalidating in background")
 
     # Date range
     st.sidebar.subheader("Analysis Period")
@@ -204,13 +335,41 @@ def main_dashboard():
         st.warning("No rates found for the selected filters.")
         return
 
-    daily_df = expand_date_ranges(df)
+    # Kept with a gap report, so Fill Gaps patches it with the rates it was built from
+    report_filters = (start_date, end_date, city_filter, star_filter, supplier_filter, hotel_filter)
 
     # Sidebar stats
     st.sidebar.markdown("---")
     st.sidebar.caption(f"Rates loaded: {len(df):,}")
     st.sidebar.caption(f"Hotels: {df['hotel_id'].n_unique()}")
-    st.sidebar.caption(f"Daily records: {len(daily_df):,}")
+    pool_stats = get_pool_stats()
+    st.sidebar.caption(
+        f"DB pool: {pool_stats['in_use']} in use / {pool_stats['open']} open "
+        f"(max {pool_stats['max_size']}), {pool_stats['reused']} reused"
+    )
+    cache_stats = get_cache_stats()
+    st.sidebar.caption(
+        f"Reference cache: {sum(c['hits'] for c in cache_stats)} hits / "
+        f"{sum(c['misses'] for c in cache_stats)} misses, "
+        f"{sum(c['entries'] for c in cache_stats)} entries"
+    )
+    for name, latency in health.get_latency_stats().items():
+        status = health.status(name)
+        state = {True: "up", False: "down", None: "unknown"}[status["ok"]]
+        st.sidebar.caption(
+            f"{name.capitalize()} health: {state}"
+            + (f", probe p50 {latency['p50_ms']:.0f} ms / p95 {latency['p95_ms']:.0f} ms" if latency["p50_ms"] is not None else "")
+        )
+    hasura_metrics = [m for op, m in get_hasura_metrics().items() if op != "TestConnection"]
+    if hasura_metrics:
+        # Operations only seen as coalesced calls have no latencies yet
+        p95s = [m["p95_ms"] for m in hasura_metrics if m["p95_ms"] is not None]
+        st.sidebar.caption(
+            f"Hasura: {sum(m['calls'] for m in hasura_metrics)} calls, "
+            f"{sum(m['errors'] for m in hasura_metrics)} errors, "
+            f"{sum(m['retries'] for m in hasura_metrics)} retries"
+            + (f", max p95 {max(p95s):.0f} ms" if p95s else "")
+        )
 
     # Tabs
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["📋 Gap Report", "👥 By Supplier", "📊 Summary", "📅 Visualizations", "✏️ Fill Gaps"])
@@ -277,23 +436,104 @@ def main_dashboard():
                 key="required_occupancies",
             )
 
+        server_gaps = st.checkbox(
+            "Compute gaps in database",
+            key="server_gaps",
+            help="Run gap detection inside PostgreSQL (14+) and fetch only the gap intervals",
+        )
+
         st.markdown("---")
 
         # Generate report
         if st.button("🔍 Generate Gap Report", type="primary"):
             with st.spinner("Analyzing gaps..."):
-                gaps_df = generate_all_hotel_gaps(
-                    daily_df,
-                    start_date,
-                    end_date,
-                    st.session_state.exclusions,
-                    required_boards,
-                    required_occupancies,
-                    hotel_filter=hotel_options[hotel_filter],
-                    city_filter=city_filter if city_filter != "All" else None,
-                )
+                gap_params = {
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "exclusions": ExclusionSet(st.session_state.exclusions),
+                    "required_boards": required_boards,
+                    "required_occupancies": required_occupancies,
+                }
+                # Unfiltered default-period reports for a preset are precomputed by worker.py
+                precomputed = None
+                preset = find_gap_preset(required_boards, required_occupancies)
+                if (
+                    preset is not None
+                    and not st.session_state.exclusions
+                    and not st.session_state.created_rates
+                    and (start_date, end_date) == preset_window()
+                    and (city_filter, star_filter, supplier_filter, hotel_filter) == ("All",) * 4
+                ):
+                    precomputed = get_gap_store().get(preset, rates_version, start_date, end_date)
+
+                if precomputed is not None:
+                    gaps_df, precomputed_at = precomputed
+                else:
+                    def compute_gaps():
+                        if server_gaps:
+                            # Rates created this session are pending approval, so pass them along as coverage
+                            created_df = df.filter(pl.col("rate_id").is_not_null()) if "rate_id" in df.columns else df.clear()
+                            return gaps_to_dataframe(get_gap_intervals(
+                                start_date,
+                                end_date,
+                                gap_params["exclusions"],
+                                required_boards,
+                                required_occupancies,
+                                city_filter=city_filter,
+                                hotel_filter=hotel_options[hotel_filter],
+                                supplier_filter=supplier_options[supplier_filter],
+                                star_filter=star_filter if star_filter != "All" else None,
+                                extra_rates=created_df.select([
+                                    "hotel_id", "supplier_id", "start_date", "end_date", "board", "capacity",
+                                ]).to_dicts(),
+                            ))
+                        else:
+                            # Index is reused while only requirements/exclusions change
+                            coverage_index = load_coverage_index(
+                                df, start_date, end_date,
+                                (
+                                    city_filter, star_filter, supplier_filter, hotel_filter,
+                                    rates_version,
+                                    tuple(r["rate_id"] for r in st.session_state.created_rates),
+                                ),
+                            )
+                            return coverage_index.find_gaps(
+                                gap_params["exclusions"],
+                                required_boards,
+                                required_occupancies,
+                                hotel_filter=hotel_options[hotel_filter],
+                                city_filter=city_filter if city_filter != "All" else None,
+                            )
+
+                    # Identical requests from any session share one result until the rates change
+                    report_key = gap_report_key(
+                        start_date,
+                        end_date,
+                        gap_params["exclusions"],
+                        required_boards,
+                        required_occupancies,
+                        {
+                            "city": city_filter,
+                            "star": star_filter,
+                            "supplier": supplier_options[supplier_filter],
+                            "hotel": hotel_options[hotel_filter],
+                            "created_rates": [r["rate_id"] for r in st.session_state.created_rates] or None,
+                            "server": server_gaps or None,
+                        },
+                        rates_version,
+                    )
+                    gaps_df = gap_reports.get_or_load(report_key, compute_gaps)
 
             st.session_state.gaps_df = gaps_df
+            st.session_state.gap_params = gap_params
+            st.session_state.gap_report_filters = report_filters
+            if precomputed is not None:
+                st.caption(f"Precomputed report from {precomputed_at}")
+            if st.session_state.created_rates:
+                st.caption(
+                    f"Counts {len(st.session_state.created_rates)} rates pending approval created this session "
+                    "as coverage. Refresh Data loads active rates only, so their gaps return until approved."
+                )
 
             if len(gaps_df) == 0:
                 st.success("🎉 No gaps found! All hotels have complete coverage.")
@@ -312,7 +552,7 @@ def main_dashboard():
                 col4.metric("Occupancy Gaps", len(occ_gaps))
 
                 hotels_with_gaps = gaps_df["hotel_id"].n_unique()
-                total_hotels = daily_df["hotel_id"].n_unique()
+                total_hotels = df["hotel_id"].n_unique()
                 st.metric("Hotels with Gaps", f"{hotels_with_gaps} / {total_hotels}")
 
                 st.markdown("---")
@@ -382,141 +622,31 @@ def main_dashboard():
                 )
 
             with col_exp2:
-                # Enhanced Excel template with reference sheets
-                from openpyxl import Workbook
-
-                # Create workbook
-                wb = Workbook()
-
-                # Sheet 1: Gap Template - expanded by room type (one row per room type per gap)
-                ws_gaps = wb.active
-                ws_gaps.title = "Gaps_Template"
-
-                # Headers for expanded template
-                headers = [
-                    "hotel_id", "organization_id", "hotel_name", "city", "star_rating",
-                    "gap_type", "detail", "start_date", "end_date", "duration_days",
-                    "supplier_name", "room_type_id", "room_name", "max_occupancy",
-                    "supplier_id_to_fill", "occupancy", "weekday_rate", "weekend_rate",
-                    "currency", "rate_type", "min_booking_days_in_advance", "num_of_rooms",
-                    "included_meal_type_code"
-                ]
-                for col_idx, header in enumerate(headers, 1):
-                    ws_gaps.cell(row=1, column=col_idx, value=header)
-
-                # Build hotel -> room_types cache
-                hotel_room_types_cache = {}
-                unique_hotels = st.session_state.gaps_df.select(["hotel_id"]).unique()
-                for hotel_row in unique_hotels.iter_rows(named=True):
-                    hotel_id = hotel_row["hotel_id"]
-                    hotel_room_types_cache[hotel_id] = load_room_types_for_hotel(hotel_id)
-
-                # Expand gaps by room type
-                row_idx = 2
-                for gap_row in st.session_state.gaps_df.iter_rows(named=True):
-                    hotel_id = gap_row["hotel_id"]
-                    room_types = hotel_room_types_cache.get(hotel_id, [])
-
-                    # Format dates
-                    start_date_str = gap_row["gap_start"].strftime("%Y-%m-%d") if hasattr(gap_row["gap_start"], "strftime") else str(gap_row["gap_start"])
-                    end_date_str = gap_row["gap_end"].strftime("%Y-%m-%d") if hasattr(gap_row["gap_end"], "strftime") else str(gap_row["gap_end"])
-
-                    if not room_types:
-                        # No room types - still create one row with empty room info
-                        ws_gaps.cell(row=row_idx, column=1, value=hotel_id)
-                        ws_gaps.cell(row=row_idx, column=2, value=gap_row.get("organization_id", ""))
-                        ws_gaps.cell(row=row_idx, column=3, value=gap_row["hotel_name"])
-                        ws_gaps.cell(row=row_idx, column=4, value=gap_row["city"])
-                        ws_gaps.cell(row=row_idx, column=5, value=gap_row["star_rating"])
-                        ws_gaps.cell(row=row_idx, column=6, value=gap_row["gap_type"])
-                        ws_gaps.cell(row=row_idx, column=7, value=gap_row["detail"])
-                        ws_gaps.cell(row=row_idx, column=8, value=start_date_str)
-                        ws_gaps.cell(row=row_idx, column=9, value=end_date_str)
-                        ws_gaps.cell(row=row_idx, column=10, value=gap_row["duration_days"])
-                        ws_gaps.cell(row=row_idx, column=11, value=gap_row["supplier_name"])
-                        ws_gaps.cell(row=row_idx, column=19, value="SAR")
-                        ws_gaps.cell(row=row_idx, column=20, value="subject_to_availability")
-                        row_idx += 1
-                    else:
-                        # Create one row per room type
-                        for rt in room_types:
-                            ws_gaps.cell(row=row_idx, column=1, value=hotel_id)
-                            ws_gaps.cell(row=row_idx, column=2, value=gap_row.get("organization_id", ""))
-                            ws_gaps.cell(row=row_idx, column=3, value=gap_row["hotel_name"])
-                            ws_gaps.cell(row=row_idx, column=4, value=gap_row["city"])
-                            ws_gaps.cell(row=row_idx, column=5, value=gap_row["star_rating"])
-                            ws_gaps.cell(row=row_idx, column=6, value=gap_row["gap_type"])
-                            ws_gaps.cell(row=row_idx, column=7, value=gap_row["detail"])
-                            ws_gaps.cell(row=row_idx, column=8, value=start_date_str)
-                            ws_gaps.cell(row=row_idx, column=9, value=end_date_str)
-                            ws_gaps.cell(row=row_idx, column=10, value=gap_row["duration_days"])
-                            ws_gaps.cell(row=row_idx, column=11, value=gap_row["supplier_name"])
-                            ws_gaps.cell(row=row_idx, column=12, value=str(rt["id"]))  # room_type_id pre-filled
-                            ws_gaps.cell(row=row_idx, column=13, value=rt["name"])  # room_name pre-filled
-                            ws_gaps.cell(row=row_idx, column=14, value=rt["max_occupancy"])  # max_occupancy pre-filled
-                            ws_gaps.cell(row=row_idx, column=19, value="SAR")
-                            ws_gaps.cell(row=row_idx, column=20, value="subject_to_availability")
-                            row_idx += 1
-
-                # Sheet 2: Suppliers Reference
-                ws_suppliers = wb.create_sheet("Suppliers")
-                ws_suppliers.cell(row=1, column=1, value="supplier_id")
-                ws_suppliers.cell(row=1, column=2, value="supplier_name")
-                for row_idx, supplier in enumerate(all_suppliers, 2):
-                    ws_suppliers.cell(row=row_idx, column=1, value=str(supplier["id"]))
-                    ws_suppliers.cell(row=row_idx, column=2, value=supplier["name"])
-
-                # Sheet 3: Room Types Reference
-                ws_rooms = wb.create_sheet("Room_Types")
-                ws_rooms.cell(row=1, column=1, value="hotel_id")
-                ws_rooms.cell(row=1, column=2, value="hotel_name")
-                ws_rooms.cell(row=1, column=3, value="room_type_id")
-                ws_rooms.cell(row=1, column=4, value="room_name")
-                ws_rooms.cell(row=1, column=5, value="max_occupancy")
-                row_idx = 2
-                # Get unique hotels from gaps
-                unique_hotels = st.session_state.gaps_df.select(["hotel_id", "hotel_name"]).unique()
-                for hotel_row in unique_hotels.iter_rows(named=True):
-                    room_types = load_room_types_for_hotel(hotel_row["hotel_id"])
-                    for rt in room_types:
-                        ws_rooms.cell(row=row_idx, column=1, value=hotel_row["hotel_id"])
-                        ws_rooms.cell(row=row_idx, column=2, value=hotel_row["hotel_name"])
-                        ws_rooms.cell(row=row_idx, column=3, value=str(rt["id"]))
-                        ws_rooms.cell(row=row_idx, column=4, value=rt["name"])
-                        ws_rooms.cell(row=row_idx, column=5, value=rt["max_occupancy"])
-                        row_idx += 1
-
-                # Sheet 4: Meal Types Reference
-                ws_meals = wb.create_sheet("Meal_Types")
-                ws_meals.cell(row=1, column=1, value="meal_type_code")
-                ws_meals.cell(row=1, column=2, value="meal_type_name")
-                meal_types = load_all_meal_types()
-                for row_idx, mt in enumerate(meal_types, 2):
-                    ws_meals.cell(row=row_idx, column=1, value=mt["code"])
-                    ws_meals.cell(row=row_idx, column=2, value=mt["name"])
-
-                # Sheet 5: Occupancy Codes Reference
-                ws_occ = wb.create_sheet("Occupancy_Codes")
-                ws_occ.cell(row=1, column=1, value="occupancy_code")
-                ws_occ.cell(row=1, column=2, value="occupancy_name")
-                ws_occ.cell(row=1, column=3, value="capacity")
-                for row_idx, (name, code) in enumerate(OCCUPANCY_CODES.items(), 2):
-                    ws_occ.cell(row=row_idx, column=1, value=code)
-                    ws_occ.cell(row=row_idx, column=2, value=name)
-                    ws_occ.cell(row=row_idx, column=3, value=REQUIRED_OCCUPANCIES[name])
-
-                # Save to bytes
-                excel_buffer = io.BytesIO()
-                wb.save(excel_buffer)
-                excel_data = excel_buffer.getvalue()
+                # Excel template with reference sheets, built only when requested
+                gaps_key = gaps_fingerprint(st.session_state.gaps_df)
+                if st.session_state.get("excel_template_key") != gaps_key:
+                    if st.button("📄 Prepare Rate Template (Excel)"):
+                        st.session_state.excel_template_key = gaps_key
+                        st.rerun()
+                else:
+                    with st.spinner("Building Excel template..."):
+                        template_room_types = load_room_types_for_hotels(gap_hotel_ids(st.session_state.gaps_df))
+                        template_meal_types = load_all_meal_types()
+                        excel_data = load_rate_template(
+                            (gaps_key, reference_fingerprint(template_room_types, all_suppliers, template_meal_types)),
+                            st.session_state.gaps_df,
+                            template_room_types,
+                            all_suppliers,
+                            template_meal_types,
+                        )
 
-                st.download_button(
-                    label="📥 Download Rate Template (Excel)",
-                    data=excel_data,
-                    file_name=f"gap_rate_template_{date.today().strftime('%d-%m-%Y')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    type="primary",
-                )
+                    st.download_button(
+                        label="📥 Download Rate Template (Excel)",
+                        data=excel_data,
+                        file_name=f"gap_rate_template_{date.today().strftime('%d-%m-%Y')}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        type="primary",
+                    )
 
             st.caption("Excel template includes reference sheets for suppliers, room types, meal types, and occupancy codes.")
         else:
@@ -590,20 +720,20 @@ def main_dashboard():
 
         # Overall stats
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Hotels", daily_df["hotel_id"].n_unique())
-        col2.metric("Total Suppliers", daily_df["supplier_name"].n_unique())
+        col1.metric("Total Hotels", df["hotel_id"].n_unique())
+        col2.metric("Total Suppliers", df["supplier_name"].n_unique())
         col3.metric("Date Range", f"{start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')}")
 
         # City breakdown
         st.markdown("### Hotels by City")
-        city_stats = daily_df.group_by("city").agg([
+        city_stats = df.group_by("city").agg([
             pl.col("hotel_id").n_unique().alias("hotels"),
         ])
         st.dataframe(city_stats.to_pandas(), hide_index=True)
 
         # Star rating breakdown
         st.markdown("### Hotels by Star Rating")
-        star_stats = daily_df.group_by("star_rating").agg([
+        star_stats = df.group_by("star_rating").agg([
             pl.col("hotel_id").n_unique().alias("hotels"),
         ]).sort("star_rating")
         st.dataframe(star_stats.to_pandas(), hide_index=True)
@@ -646,33 +776,12 @@ def main_dashboard():
             st.markdown("### 📅 Gap Calendar Heatmap")
             st.caption("Shows the number of gaps per day across all hotels")
 
-            # Expand gaps to daily and count gaps per date
-            gap_dates = []
-            for row in gaps_df.iter_rows(named=True):
-                current = row["gap_start"]
-                while current <= row["gap_end"]:
-                    gap_dates.append({
-                        "date": current,
-                        "gap_type": row["gap_type"],
-                        "hotel_id": row["hotel_id"],
-                    })
-                    current = current + timedelta(days=1)
-
-            if gap_dates:
-                gap_daily = pl.DataFrame(gap_dates)
-                gap_counts = gap_daily.group_by("date").agg([
-                    pl.len().alias("gap_count"),
-                    pl.col("hotel_id").n_unique().alias("hotels_affected"),
-                ]).sort("date")
-
-                # Create calendar heatmap
-                gap_counts_pd = gap_counts.to_pandas()
-                gap_counts_pd["week"] = gap_counts_pd["date"].dt.isocalendar().week
-                gap_counts_pd["weekday"] = gap_counts_pd["date"].dt.dayofweek
-                gap_counts_pd["month"] = gap_counts_pd["date"].dt.strftime("%Y-%m")
+            # Per-day, per-month and hotel x month gap counts (cached per gap report)
+            density = load_gap_density(gaps_fingerprint(gaps_df), gaps_df)
 
+            if len(density.daily) > 0:
                 fig = px.density_heatmap(
-                    gap_counts_pd,
+                    density.daily.to_pandas(),
                     x="date",
                     y="gap_count",
                     title="Gap Density Over Time",
@@ -683,13 +792,8 @@ def main_dashboard():
 
                 # Monthly summary heatmap
                 st.markdown("### 📊 Monthly Gap Summary")
-                monthly_gaps = gap_counts_pd.groupby("month").agg({
-                    "gap_count": "sum",
-                    "hotels_affected": "max"
-                }).reset_index()
-
                 fig2 = px.bar(
-                    monthly_gaps,
+                    density.monthly.to_pandas(),
                     x="month",
                     y="gap_count",
                     color="hotels_affected",
@@ -765,40 +869,14 @@ def main_dashboard():
             st.markdown("### 🏨 Hotel Coverage Matrix")
             st.caption("Shows which hotels have gaps in which months")
 
-            # Create hotel x month matrix
-            hotel_month_gaps = []
-            for row in gaps_df.iter_rows(named=True):
-                current = row["gap_start"]
-                while current <= row["gap_end"]:
-                    hotel_month_gaps.append({
-                        "hotel_name": row["hotel_name"],
-                        "month": current.strftime("%Y-%m"),
-                        "gap_type": row["gap_type"],
-                    })
-                    current = current + timedelta(days=1)
-
-            if hotel_month_gaps:
-                hm_df = pl.DataFrame(hotel_month_gaps)
-                hm_summary = hm_df.group_by(["hotel_name", "month"]).agg([
-                    pl.len().alias("gap_days")
-                ]).to_pandas()
-
-                # Pivot for heatmap
-                hm_pivot = hm_summary.pivot(
-                    index="hotel_name",
-                    columns="month",
-                    values="gap_days"
-                ).fillna(0)
-
+            if len(density.hotel_month) > 0:
                 # Limit to top 20 hotels
-                hotel_totals = hm_pivot.sum(axis=1).sort_values(ascending=False)
-                top_20 = hotel_totals.head(20).index.tolist()
-                hm_pivot_top = hm_pivot.loc[top_20]
+                top_20, months, gap_days = density.hotel_month_matrix(top_n=20)
 
                 fig4 = go.Figure(data=go.Heatmap(
-                    z=hm_pivot_top.values,
-                    x=hm_pivot_top.columns.tolist(),
-                    y=hm_pivot_top.index.tolist(),
+                    z=gap_days,
+                    x=months,
+                    y=top_20,
                     colorscale="Reds",
                     hoverongaps=False,
                     hovertemplate="Hotel: %{y}<br>Month: %{x}<br>Gap Days: %{z}<extra></extra>",
@@ -814,13 +892,9 @@ def main_dashboard():
             # 4. Gap Type Distribution Over Time
             st.markdown("### 📉 Gap Types Over Time")
 
-            if gap_dates:
-                gap_type_time = pl.DataFrame(gap_dates).group_by(["date", "gap_type"]).agg([
-                    pl.len().alias("count")
-                ]).sort("date").to_pandas()
-
+            if len(density.daily_by_type) > 0:
                 fig5 = px.area(
-                    gap_type_time,
+                    density.daily_by_type.to_pandas(),
                     x="date",
                     y="count",
                     color="gap_type",
@@ -840,10 +914,107 @@ def main_dashboard():
         st.subheader("Create Rates to Fill Gaps")
 
         # Check Hasura connection
-        hasura_connected = test_hasura_connection()
+        hasura_connected = health.is_healthy("hasura")
         if not hasura_connected:
             st.warning("Hasura GraphQL not configured. Add HASURA_GRAPHQL_URL and HASURA_ADMIN_SECRET to .env file to enable rate creation.")
 
+        # Bulk creation from a filled rate template (exported from the Gap Report tab)
+        with st.expander("📤 Import Filled Rate Template (Excel)"):
+            uploaded_template = st.file_uploader(
+                "Filled rate template",
+                type=["xlsx"],
+                key="rate_template_upload",
+                help="Fill supplier_id_to_fill, occupancy, rates and meal type in the Gaps_Template sheet; unfilled rows are skipped",
+            )
+
+            if uploaded_template is not None:
+                # Validate once per uploaded file, not on every rerun
+                if st.session_state.get("rate_import_file") != uploaded_template.file_id:
+                    with st.spinner("Reading and validating template..."):
+                        try:
+                            template_df = read_rate_template(uploaded_template)
+                        except Exception as e:
+                            template_df = None
+                            st.error(f"Cannot read template: {e}")
+
+                        if template_df is not None:
+                            try:
+                                # IDs are validated before any of them is sent to the database
+                                validated = validate_rate_rows(
+                                    template_df,
+                                    all_hotels,
+                                    load_room_types_for_hotels(template_hotel_ids(template_df)),
+                                    all_suppliers,
+                                    load_all_meal_types(),
+                                )
+                                st.session_state.rate_import = mark_existing_rates(
+                                    validated, get_existing_rate_keys(rate_keys(validated))
+                                )
+                                st.session_state.rate_import_file = uploaded_template.file_id
+                                st.session_state.rate_import_results = None
+                            except Exception as e:
+                                st.error(f"Cannot validate template: {e}")
+
+                rate_import = st.session_state.get("rate_import") if st.session_state.get("rate_import_file") == uploaded_template.file_id else None
+                if rate_import is not None:
+                    valid_rows = rate_import.filter(pl.col("error").is_null())
+                    invalid_rows = rate_import.filter(pl.col("error").is_not_null())
+
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Filled Rows", len(rate_import))
+                    col2.metric("Valid", len(valid_rows))
+                    col3.metric("Rejected", len(invalid_rows))
+
+                    if len(invalid_rows) > 0:
+                        st.dataframe(
+                            invalid_rows.select(["row", "hotel_name", "room_type_id", "supplier_id", "start_date", "end_date", "error"]).to_pandas(),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
+
+                    results = st.session_state.get("rate_import_results")
+                    if st.button(
+                        f"Create {len(valid_rows)} Rates",
+                        type="primary",
+                        disabled=not hasura_connected or len(valid_rows) == 0 or results is not None,
+                        key="submit_rate_import",
+                    ):
+                        with st.spinner(f"Creating {len(valid_rows)} rates..."):
+                            results = insert_hotel_rates(rate_insert_rows(valid_rows))
+                        st.session_state.rate_import_results = results
+
+                        # Patch the created rates into the cached rates, like single rate creation
+                        for row, result in zip(valid_rows.iter_rows(named=True), results):
+                            if result["status"] == "created":
+                                st.session_state.created_rates.append({
+                                    "rate_id": result["id"],
+                                    "hotel_id": row["hotel_id"],
+                                    "organization_id": row["organization_id"],
+                                    "hotel_name": row["hotel_name"],
+                                    "city": row["city"],
+                                    "star_rating": row["star_rating"],
+                                    "room_type_id": row["room_type_id"],
+                                    "room_name": row["room_name"],
+                                    "capacity": row["capacity"],
+                                    "start_date": row["start_date"],
+                                    "end_date": row["end_date"],
+                                    "board": row["board"],
+                                    "supplier_id": row["supplier_id"],
+                                    "supplier_name": row["supplier_name"],
+                                })
+
+                    if results is not None:
+                        outcome = pl.DataFrame(results, schema={"status": pl.String, "id": pl.String, "error": pl.String})
+                        created = outcome.filter(pl.col("status") == "created").height
+                        st.success(f"{created} of {len(results)} rates created with status 'pending_approval'.")
+                        failed = pl.concat([valid_rows.select(["row", "hotel_name"]), outcome], how="horizontal").filter(
+                            pl.col("status") != "created"
+                        )
+                        if len(failed) > 0:
+                            st.warning(f"{len(failed)} rates were not created.")
+                            st.dataframe(failed.select(["row", "hotel_name", "status", "error"]).to_pandas(), hide_index=True, use_container_width=True)
+                        st.info("Generate the gap report again to include the imported rates.")
+
         if "gaps_df" not in st.session_state or len(st.session_state.gaps_df) == 0:
             st.info("Generate a gap report first in the 'Gap Report' tab to fill gaps.")
         else:
@@ -895,7 +1066,7 @@ def main_dashboard():
 
             # Room type dropdown (filtered by hotel)
             hotel_id = selected_gap["hotel_id"]
-            room_types = load_room_types_for_hotel(hotel_id)
+            room_types = load_room_types_for_hotels(gap_hotel_ids(gaps_df)).get(hotel_id, [])
 
             if not room_types:
                 st.warning(f"No room types found for this hotel. Please add room types first.")
@@ -934,7 +1105,7 @@ def main_dashboard():
             with col2:
                 rate_type = st.selectbox(
                     "Rate Type",
-                    ["subject_to_availability", "guaranteed"],
+                    RATE_TYPES,
                     key="rate_type_select"
                 )
 
@@ -948,6 +1119,26 @@ def main_dashboard():
             )
             selected_meal_code = meal_type_options[selected_meal_name]
 
+            # Meal upgrades, created in the same mutation as the rate
+            supplement_meals = st.multiselect(
+                "Meal Supplements (optional)",
+                [name for name in meal_type_options if name != selected_meal_name],
+                key="rate_supplement_meals",
+                help="Meal upgrades priced on top of the rate",
+            )
+            meal_supplements = []
+            for meal_name in supplement_meals:
+                supplement_price = st.number_input(
+                    f"{meal_name} Supplement",
+                    min_value=0.0,
+                    step=5.0,
+                    key=f"rate_supplement_{meal_type_options[meal_name]}",
+                )
+                meal_supplements.append({
+                    "meal_type_code": meal_type_options[meal_name],
+                    "supplement_price": supplement_price,
+                })
+
             # Optional fields
             col1, col2 = st.columns(2)
             with col1:
@@ -984,11 +1175,16 @@ def main_dashboard():
                     "included_meal_type_code": selected_meal_code,
                     "min_booking_days_in_advance": min_booking_days if min_booking_days > 0 else None,
                     "num_of_rooms": num_rooms,
-                    "status": "pending_approval"
+                    "status": "pending_approval",
+                    "meal_supplements": meal_supplements,
                 })
 
             # Submit button
-            submit_disabled = not hasura_connected or not room_type_options or weekday_rate <= 0 or weekend_rate <= 0
+            supplements_valid = all(supplement["supplement_price"] > 0 for supplement in meal_supplements)
+            submit_disabled = (
+                not hasura_connected or not room_type_options or weekday_rate <= 0 or weekend_rate <= 0
+                or not supplements_valid
+            )
 
             if st.button("Create Rate", type="primary", disabled=submit_disabled, key="submit_rate"):
                 # Prepare dates
@@ -1011,6 +1207,7 @@ def main_dashboard():
                         included_meal_type_code=selected_meal_code,
                         min_booking_days_in_advance=min_booking_days if min_booking_days > 0 else None,
                         num_of_rooms=num_rooms,
+                        meal_supplements=meal_supplements,
                     )
 
                 if "errors" in result:
@@ -1020,20 +1217,63 @@ def main_dashboard():
                     else:
                         st.error(f"Error creating rate: {error_msg}")
                 else:
-                    rate_id = result.get("data", {}).get("insert_hotel_rates_one", {}).get("id", "N/A")
-                    st.success(f"Rate created successfully! ID: {rate_id}")
-                    st.info("Note: Rate status is 'pending_approval'. Refresh data to see updated gaps.")
+                    created = result.get("data", {}).get("insert_hotel_rates_one", {})
+                    rate_id = created.get("id", "N/A")
+                    supplements_created = len(created.get("hotel_rate_meal_supplements") or [])
+                    st.success(
+                        f"Rate created successfully! ID: {rate_id}"
+                        + (f" ({supplements_created} meal supplements)" if supplements_created else "")
+                    )
 
-                    # Clear rate cache
-                    if st.button("Refresh Data", key="refresh_after_create"):
-                        load_all_rates.clear()
-                        st.rerun()
+                    # Patch the new rate into the cached rates and recompute this hotel's gaps only
+                    room_type = next(rt for rt in room_types if str(rt["id"]) == selected_room_type_id)
+                    created_rate = {
+                        "rate_id": rate_id,
+                        "hotel_id": hotel_id,
+                        "organization_id": selected_gap.get("organization_id"),
+                        "hotel_name": selected_gap["hotel_name"],
+                        "city": selected_gap["city"],
+                        "star_rating": selected_gap["star_rating"],
+                        "room_type_id": selected_room_type_id,
+                        "room_name": room_type["name"],
+                        "capacity": room_type["max_occupancy"],
+                        "start_date": selected_gap["gap_start"],
+                        "end_date": selected_gap["gap_end"],
+                        "board": selected_meal_name,
+                        "supplier_id": selected_supplier_id,
+                        "supplier_name": selected_supplier_name,
+                    }
+                    st.session_state.created_rates.append(created_rate)
+
+                    # df only holds the report's rates while the sidebar filters are unchanged
+                    if st.session_state.get("gap_report_filters") != report_filters:
+                        st.info(
+                            "Note: Rate status is 'pending_approval'. The filters changed since the gap report "
+                            "was generated; generate it again to include this rate."
+                        )
+                    else:
+                        # Rates outside the sidebar supplier filter don't change the current report
+                        if supplier_filter in ("All", selected_supplier_name):
+                            st.session_state.gaps_df = patch_hotel_gaps(
+                                gaps_df,
+                                pl.concat([df, rates_to_dataframe([created_rate])], how="diagonal_relaxed"),
+                                hotel_id,
+                                selected_gap["gap_start"],
+                                selected_gap["gap_end"],
+                                **st.session_state.gap_params,
+                            )
+                        st.info(
+                            "Note: Rate status is 'pending_approval'. It counts as coverage in the gap report "
+                            "until Refresh Data, which loads active rates only."
+                        )
 
             if submit_disabled and hasura_connected:
                 if not room_type_options:
                     st.caption("Cannot submit: No room types available for this hotel.")
                 elif weekday_rate <= 0 or weekend_rate <= 0:
                     st.caption("Cannot submit: Rates must be greater than 0.")
+                elif not supplements_valid:
+                    st.caption("Cannot submit: Meal supplements must be greater than 0.")
 
 
 def main():
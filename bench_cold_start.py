@@ -0,0 +1,81 @@
+"""
+Benchmark the dashboard's cold start against the database in DATABASE_URL.
+
+Usage:
+    python bench_cold_start.py [--repeat 3]
+
+Modes:
+    query     empty SNAPSHOT_DIR: hotels, suppliers and rates are queried
+    snapshot  SNAPSHOT_DIR written by a previous run: all three are read
+              from their Arrow IPC snapshots (revalidation runs in the
+              background and is not timed)
+
+Each run is a fresh subprocess with the database connection opened before
+timing, so only the data load is measured.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["query", "snapshot"]
+
+
+def run_start(snapshot_dir: str) -> dict:
+    """Load hotels, suppliers and rates the way a fresh dashboard process does."""
+    from db import get_hotels, get_suppliers, test_connection
+    from rate_store import RateStore
+    from snapshot import SnapshotStore
+
+    test_connection()
+    snapshots = SnapshotStore(snapshot_dir)
+    started = time.perf_counter()
+    hotels = snapshots.records("hotels", get_hotels)
+    suppliers = snapshots.records("suppliers", get_suppliers)
+    rates = RateStore(snapshots=snapshots).load()
+    return {
+        "seconds": time.perf_counter() - started,
+        "hotels": len(hotels),
+        "suppliers": len(suppliers),
+        "rates": len(rates),
+    }
+
+
+def start_process(snapshot_dir: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--start", snapshot_dir],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's cold start")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode (best time is reported)")
+    parser.add_argument("--start", metavar="SNAPSHOT_DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.start:
+        print(json.dumps(run_start(args.start)))
+        return
+
+    print(f"{'mode':<9} {'best s':>8} {'hotels':>7} {'suppliers':>10} {'rates':>8}")
+    for mode in MODES:
+        runs = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as snapshot_dir:
+                if mode == "snapshot":
+                    start_process(snapshot_dir)
+                runs.append(start_process(snapshot_dir))
+        best = min(runs, key=lambda r: r["seconds"])
+        print(
+            f"{mode:<9} {best['seconds']:>8.3f} {best['hotels']:>7,} "
+            f"{best['suppliers']:>10,} {best['rates']:>8,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
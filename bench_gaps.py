@@ -0,0 +1,99 @@
+"""
+Benchmark the partitioned gap analysis on synthetic rates.
+
+Usage:
+    python bench_gaps.py [--hotels 3000] [--rates 60000] [--workers 1 2 4] [--repeat 3]
+
+Builds one CoverageIndex for a year of synthetic rates and times
+CoverageIndex.find_gaps (all boards and occupancies required) for each
+worker count. Speedup is relative to workers=1 and needs that many CPUs:
+NumPy and Polars release the GIL, but a single core still runs the
+partitions one after another.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+BOARDS = [
+    "Room Only", "Breakfast Included", "Sohour Included", "Lunch Included",
+    "Iftar Included", "Dinner Included", "Half Board", "Full Board",
+]
+START = date(2026, 1, 1)
+END = date(2026, 12, 31)
+
+
+def synthetic_rates(n_hotels: int, n_rates: int, seed: int = 1) -> list:
+    """Rates of random length, board and capacity spread over n_hotels hotels."""
+    rnd = random.Random(seed)
+    hotels = [
+        {
+            "hotel_id": f"h-{i:05d}",
+            "organization_id": f"org-{i % 20}",
+            "hotel_name": f"Hotel {i}",
+            "city": rnd.choice(["Makkah", "Madinah"]),
+            "star_rating": rnd.randint(1, 5),
+        }
+        for i in range(n_hotels)
+    ]
+    rates = []
+    for i in range(n_rates):
+        start = START + timedelta(days=rnd.randint(-30, 360))
+        supplier = rnd.randint(0, 9)
+        rates.append({
+            **rnd.choice(hotels),
+            "room_type_id": f"rt-{i}",
+            "room_name": "Room",
+            "capacity": rnd.randint(1, 5),
+            "start_date": start,
+            "end_date": start + timedelta(days=rnd.randint(0, 60)),
+            "board": rnd.choice(BOARDS),
+            "supplier_id": f"s-{supplier}",
+            "supplier_name": f"Supplier {supplier}",
+        })
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the partitioned gap analysis")
+    parser.add_argument("--hotels", type=int, default=3000, help="Synthetic hotels")
+    parser.add_argument("--rates", type=int, default=60000, help="Synthetic rates")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to time")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per worker count (best time is reported)")
+    args = parser.parse_args()
+
+    # The shared pool is sized from GAP_WORKERS when gap_analyzer is imported
+    os.environ["GAP_WORKERS"] = str(max(args.workers))
+    from gap_analyzer import CoverageIndex
+    from gap_rules import BOARD_EQUIVALENTS, REQUIRED_OCCUPANCIES
+    from rates_schema import rates_to_dataframe
+
+    rates_df = rates_to_dataframe(synthetic_rates(args.hotels, args.rates))
+    index = CoverageIndex.from_rates(rates_df, START, END)
+    requirements = ([], list(BOARD_EQUIVALENTS), list(REQUIRED_OCCUPANCIES))
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"{args.hotels:,} hotels, {len(rates_df):,} rates, {cpus} CPUs available")
+    print(f"{'workers':>7} {'best s':>8} {'speedup':>8} {'gaps':>8}")
+
+    serial = None
+    baseline = None
+    for workers in args.workers:
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            gaps = index.find_gaps(*requirements, workers=workers)
+            times.append(time.perf_counter() - started)
+        if serial is None:
+            serial = gaps
+            baseline = min(times)
+        elif not gaps.equals(serial):
+            sys.exit(f"workers={workers} returned a different report than workers={args.workers[0]}")
+        print(f"{workers:>7} {min(times):>8.3f} {baseline / min(times):>7.2f}x {len(gaps):>8,}")
+
+
+if __name__ == "__main__":
+    main()
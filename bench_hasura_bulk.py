@@ -0,0 +1,87 @@
+"""
+Benchmark bulk rate inserts against the mock Hasura server of the test suite.
+
+Usage:
+    python bench_hasura_bulk.py [--rows 200] [--latency 0.05] [--batch-size 50] [--workers 4]
+
+Times one insert_hotel_rates_one mutation per row, sent one after another
+(the Fill Gaps path), against graphql_client.insert_hotel_rates. The mock
+(tests/mock_hasura.py) sleeps --latency seconds per request to stand in
+for the network and database round trip.
+"""
+
+import argparse
+import time
+
+from graphql_client import (
+    INSERT_HOTEL_RATE_MUTATION,
+    HasuraClient,
+    build_rate_object,
+    insert_hotel_rates,
+    run_sync,
+)
+from tests.mock_hasura import MockHasura
+
+
+def synthetic_rates(n: int) -> list:
+    """Rows of build_rate_object arguments that don't collide on the unique index."""
+    return [
+        {
+            "organization_id": "org-1",
+            "hotel_id": f"h-{i % 50}",
+            "room_type_id": f"rt-{i}",
+            "supplier_id": "s-1",
+            "start_date": "2026-01-01",
+            "end_date": "2026-01-31",
+            "occupancy": "DBL",
+            "weekday_rate": 100.0,
+            "weekend_rate": 120.0,
+            "currency": "SAR",
+            "rate_type": "subject_to_availability",
+            "included_meal_type_code": "ROOM_ONLY",
+        }
+        for i in range(n)
+    ]
+
+
+def time_sequential(rates: list, latency: float) -> tuple:
+    with MockHasura(delay=latency) as hasura:
+        client = HasuraClient(url=hasura.url, admin_secret="bench")
+        started = time.perf_counter()
+        for rate in rates:
+            run_sync(client.execute(INSERT_HOTEL_RATE_MUTATION, {"object": build_rate_object(**rate)}))
+        elapsed = time.perf_counter() - started
+        run_sync(client.aclose())
+        return elapsed, len(hasura.requests), len(hasura.rates)
+
+
+def time_bulk(rates: list, latency: float, batch_size: int, workers: int) -> tuple:
+    with MockHasura(delay=latency) as hasura:
+        client = HasuraClient(url=hasura.url, admin_secret="bench", max_connections=workers)
+        started = time.perf_counter()
+        insert_hotel_rates(rates, batch_size=batch_size, max_workers=workers, client=client)
+        elapsed = time.perf_counter() - started
+        run_sync(client.aclose())
+        return elapsed, len(hasura.requests), len(hasura.rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk rate inserts against a mock Hasura")
+    parser.add_argument("--rows", type=int, default=200, help="Rates to insert")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock seconds per request")
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows per insert_hotel_rates mutation")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent mutations")
+    args = parser.parse_args()
+
+    rates = synthetic_rates(args.rows)
+    print(f"{args.rows} rows, {args.latency * 1000:.0f} ms per request")
+    print(f"{'path':<12} {'seconds':>8} {'requests':>9} {'created':>8}")
+    for name, (elapsed, requests, created) in [
+        ("sequential", time_sequential(rates, args.latency)),
+        ("bulk", time_bulk(rates, args.latency, args.batch_size, args.workers)),
+    ]:
+        print(f"{name:<12} {elapsed:>8.2f} {requests:>9} {created:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the rates loaders against the database in DATABASE_URL.
+
+Usage:
+    python bench_rates_loader.py [--repeat 3]
+
+Loaders:
+    dicts   get_hotel_rates (RealDictCursor) -> rates_to_dataframe
+    copy    copy_hotel_rates (COPY ... CSV) -> read_rates_csv
+
+Each run is a fresh subprocess, so peak RSS is measured per loader.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+LOADERS = ["dicts", "copy"]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_loader(name: str) -> dict:
+    """Load all rates once with the given loader and report time and memory."""
+    from db import copy_hotel_rates, get_hotel_rates, test_connection
+    from rates_schema import rates_to_dataframe, read_rates_csv
+
+    # Open the pooled connection and import everything before measuring
+    test_connection()
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    if name == "dicts":
+        df = rates_to_dataframe(get_hotel_rates())
+    else:
+        with tempfile.TemporaryFile() as tmp:
+            copy_hotel_rates(tmp)
+            tmp.seek(0)
+            df = read_rates_csv(tmp)
+
+    return {
+        "loader": name,
+        "rows": len(df),
+        "seconds": time.perf_counter() - started,
+        "peak_mb": peak_rss_mb() - baseline,
+        "frame_mb": df.estimated_size("mb"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rates loaders")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per loader (best time is reported)")
+    parser.add_argument("--loader", choices=LOADERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.loader:
+        print(json.dumps(run_loader(args.loader)))
+        return
+
+    print(f"{'loader':<8} {'rows':>10} {'best s':>8} {'peak MB':>9} {'frame MB':>9}")
+    for name in LOADERS:
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run(
+                [sys.executable, __file__, "--loader", name],
+                capture_output=True, text=True, check=True,
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(runs, key=lambda r: r["seconds"])
+        print(
+            f"{name:<8} {best['rows']:>10,} {best['seconds']:>8.2f} "
+            f"{max(r['peak_mb'] for r in runs):>9.1f} {best['frame_mb']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
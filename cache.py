@@ -0,0 +1,169 @@
+"""
+Process-wide TTL + LRU cache for reference data shared across sessions.
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+_MISSING = object()
+
+# Loads of keys that hash to the same stripe are serialized
+KEY_LOCK_STRIPES = 64
+
+# All caches created with @cached, by name
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ttl seconds after loading.
+
+    At most max_entries keys are kept; the least recently used one is
+    evicted first. Concurrent misses on the same key run the loader once:
+    loads hold one of KEY_LOCK_STRIPES locks picked by the key's hash. The
+    locks are never removed, so a waiter and a later caller always contend
+    on the same lock.
+    A load that overlaps an invalidate() is returned to its caller but not
+    stored, so nothing loaded before an invalidation outlives it.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 128):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = [threading.RLock() for _ in range(KEY_LOCK_STRIPES)]
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get_or_load(self, key, loader: Callable):
+        """Return the cached value for key, calling loader() on a miss."""
+        value = self._get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._key_locks[hash(key) % KEY_LOCK_STRIPES]:
+            # Another thread may have loaded it while we waited
+            value = self._get(key, count=False)
+            if value is not _MISSING:
+                return value
+
+            generation = self._generation
+            value = loader()
+            self._put(key, value, generation)
+            return value
+
+    def invalidate(self, key=_MISSING):
+        """Drop one key, or every entry when no key is given."""
+        with self._lock:
+            if key is _MISSING:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._generation += 1
+            self._counters["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        """Size, settings and lifetime counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                **self._counters,
+            }
+
+    def _get(self, key, count: bool = True):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self._counters["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                if count:
+                    self._counters["misses"] += 1
+                return _MISSING
+
+            self._entries.move_to_end(key)
+            if count:
+                self._counters["hits"] += 1
+            return entry[1]
+
+    def _put(self, key, value, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+
+def get_cache(name: str, ttl: float, max_entries: int = 128) -> TTLCache:
+    """
+    The registered TTLCache called name, created on first use.
+
+    ttl and max_entries are applied to an existing cache as well, so the
+    latest definition wins.
+    """
+    with _registry_lock:
+        cache = _registry.get(name)
+        if cache is None:
+            cache = _registry[name] = TTLCache(name, ttl, max_entries)
+        cache.ttl = ttl
+        cache.max_entries = max_entries
+    return cache
+
+
+def cached(name: str, ttl: float, max_entries: int = 128):
+    """
+    Cache a function's results in a named TTLCache, keyed by its arguments.
+
+    Arguments must be hashable. The cache is available as func.cache and
+    can be cleared by name with invalidate(). Caches are registered by name,
+    so re-running the defining module (as Streamlit does with the main
+    script) keeps using the same cache.
+    """
+    cache = get_cache(name, ttl, max_entries)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            return cache.get_or_load(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*names: str):
+    """Clear the named caches, or all registered caches when no name is given."""
+    with _registry_lock:
+        caches = [_registry[name] for name in names] if names else list(_registry.values())
+    for cache in caches:
+        cache.invalidate()
+
+
+def get_cache_stats() -> list:
+    """Stats of every registered cache."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return [cache.get_stats() for cache in caches]
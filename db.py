@@ -3,12 +3,17 @@ Database connection and query functions for hotel gap analysis.
 """
 
 import os
+import threading
+import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
 from dotenv import load_dotenv
 from datetime import date
 from contextlib import contextmanager
 
+from gap_rules import BOARD_EQUIVALENTS, REQUIRED_OCCUPANCIES, ExclusionSet
+
 load_dotenv()
 
 # City ID mapping
@@ -20,14 +25,194 @@ CITY_IDS = {
 CITY_NAMES = {v: k for k, v in CITY_IDS.items()}
 
 
+# Connection pool settings
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+POOL_HEALTH_CHECK_AFTER = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "30"))
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections shared by the whole process.
+
+    At most max_size connections are open at once; callers wait up to
+    acquire_timeout seconds for a free one. A connection that sat idle longer
+    than health_check_after seconds is pinged with SELECT 1 before reuse, and
+    idle connections older than idle_timeout seconds are closed.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_size: int = POOL_MAX_SIZE,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        health_check_after: float = POOL_HEALTH_CHECK_AFTER,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+    ):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._counters = {
+            "checkouts": 0,
+            "created": 0,
+            "reused": 0,
+            "health_checks": 0,
+            "discarded": 0,
+            "evicted": 0,
+        }
+
+    def getconn(self):
+        """Check out a healthy connection, opening a new one if none is idle."""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolError(f"No database connection available after {self.acquire_timeout}s")
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = psycopg2.connect(self.dsn)
+                self._count("created")
+            else:
+                self._count("reused")
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._counters["checkouts"] += 1
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection to the pool, closing it if it is broken."""
+        try:
+            if not discard and not conn.closed:
+                try:
+                    # Don't leave the connection idle in a transaction
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+            if discard or conn.closed:
+                self._close(conn)
+                self._count("discarded")
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def get_stats(self) -> dict:
+        """Pool size, usage and lifetime counters."""
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "open": len(self._idle) + self._in_use,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                **self._counters,
+            }
+
+    def _take_idle(self):
+        """Pop the most recently used healthy idle connection, evicting stale ones."""
+        while True:
+            with self._lock:
+                self._evict_idle()
+                if not self._idle:
+                    return None
+                conn, returned_at = self._idle.pop()
+
+            if conn.closed:
+                self._count("discarded")
+                continue
+
+            if time.monotonic() - returned_at > self.health_check_after:
+                self._count("health_checks")
+                if not self._ping(conn):
+                    self._close(conn)
+                    self._count("discarded")
+                    continue
+
+            return conn
+
+    def _evict_idle(self):
+        """Close idle connections past idle_timeout. Caller holds the lock."""
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [conn for conn, returned_at in self._idle if returned_at < cutoff]
+        if stale:
+            self._idle = [(conn, returned_at) for conn, returned_at in self._idle if returned_at >= cutoff]
+            for conn in stale:
+                self._close(conn)
+            self._counters["evicted"] += len(stale)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(os.getenv("DATABASE_URL"))
+        return _pool
+
+
+def get_pool_stats() -> dict:
+    """Get connection pool statistics."""
+    return get_pool().get_stats()
+
+
 @contextmanager
 def get_connection():
-    """Context manager for database connections."""
-    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    """Context manager for pooled database connections."""
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        pool.putconn(conn, discard=broken)
 
 
 def get_hotels(city_filter: str = None) -> list:
@@ -35,6 +220,7 @@ def get_hotels(city_filter: str = None) -> list:
     query = """
         SELECT DISTINCT
             h.id as hotel_id,
+            h.organization_id,
             h.name as hotel_name,
             CASE h.giata_city_id
                 WHEN '20300' THEN 'Makkah'
@@ -89,24 +275,7 @@ def get_meal_types() -> list:
             return cur.fetchall()
 
 
-def get_hotel_rates(
-    start_date: date = None,
-    end_date: date = None,
-    city_filter: str = None,
-    hotel_filter: str = None,
-    supplier_filter: str = None,
-) -> list:
-    """
-    Get all approved hotel rates with related data.
-
-    Args:
-        start_date: Filter rates that overlap with this start date
-        end_date: Filter rates that overlap with this end date
-        city_filter: Filter by city name ("Makkah" or "Madinah")
-        hotel_filter: Filter by hotel ID
-        supplier_filter: Filter by supplier ID
-    """
-    query = """
+RATES_SELECT = """
         SELECT
             h.id as hotel_id,
             h.organization_id,
@@ -124,6 +293,9 @@ def get_hotel_rates(
             COALESCE(mt.name, 'Room Only') as board,
             s.id as supplier_id,
             s.name as supplier_name
+"""
+
+RATES_FROM = """
         FROM hotels h
         JOIN room_types rt ON rt.hotel_id = h.id
         JOIN hotel_rates hr ON hr.room_type_id = rt.id
@@ -132,7 +304,20 @@ def get_hotel_rates(
         WHERE hr.status = 'active'
           AND h.giata_city_id IN ('20300', '20299')
           AND hr.end_date >= CURRENT_DATE
-    """
+"""
+
+
+def _rates_filters(
+    start_date: date = None,
+    end_date: date = None,
+    city_filter: str = None,
+    hotel_filter: str = None,
+    supplier_filter: str = None,
+    pairs: list = None,
+    star_filter: int = None,
+) -> tuple:
+    """Build the extra WHERE clauses and params shared by the rate queries."""
+    query = ""
     params = []
 
     if start_date:
@@ -157,7 +342,280 @@ def get_hotel_rates(
         query += " AND s.id = %s"
         params.append(supplier_filter)
 
-    query += " ORDER BY h.name, hr.start_date"
+    if star_filter:
+        query += " AND h.star_rating = %s"
+        params.append(star_filter)
+
+    if pairs is not None:
+        query += " AND (h.id, s.id) IN (SELECT * FROM unnest(%s::uuid[], %s::uuid[]))"
+        params.append([hotel_id for hotel_id, _ in pairs])
+        params.append([supplier_id for _, supplier_id in pairs])
+
+    return query, params
+
+
+def get_hotel_rates(
+    start_date: date = None,
+    end_date: date = None,
+    city_filter: str = None,
+    hotel_filter: str = None,
+    supplier_filter: str = None,
+    pairs: list = None,
+) -> list:
+    """
+    Get all approved hotel rates with related data.
+
+    Args:
+        start_date: Filter rates that overlap with this start date
+        end_date: Filter rates that overlap with this end date
+        city_filter: Filter by city name ("Makkah" or "Madinah")
+        hotel_filter: Filter by hotel ID
+        supplier_filter: Filter by supplier ID
+        pairs: Only rates for these (hotel_id, supplier_id) pairs
+    """
+    filters, params = _rates_filters(start_date, end_date, city_filter, hotel_filter, supplier_filter, pairs)
+    query = RATES_SELECT + RATES_FROM + filters + " ORDER BY h.name, hr.start_date"
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def copy_hotel_rates(
+    file,
+    start_date: date = None,
+    end_date: date = None,
+    city_filter: str = None,
+    hotel_filter: str = None,
+    supplier_filter: str = None,
+    pairs: list = None,
+):
+    """
+    Write approved hotel rates to a binary file object as CSV with a header.
+
+    Same rows and filters as get_hotel_rates, exported with COPY ... TO
+    STDOUT so no Python object is created per row or value. Read the file
+    back with rates_schema.read_rates_csv.
+    """
+    filters, params = _rates_filters(start_date, end_date, city_filter, hotel_filter, supplier_filter, pairs)
+    query = RATES_SELECT + RATES_FROM + filters + " ORDER BY h.name, hr.start_date"
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            copy_query = cur.mogrify(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", params)
+            cur.copy_expert(copy_query.decode(), file)
+
+
+def get_rate_checksums() -> list:
+    """
+    Get a checksum of the active future rates per (hotel_id, supplier_id).
+
+    hotel_rates has no change timestamp, so delta syncs compare these
+    checksums instead. Any added, changed, deactivated or expired rate in a
+    group (or a rename of its hotel, room type or supplier) changes the
+    group's checksum or drops the group.
+    """
+    query = """
+        SELECT
+            h.id as hotel_id,
+            s.id as supplier_id,
+            COUNT(*) as rate_count,
+            md5(string_agg(
+                concat_ws('|', hr.id, hr.start_date, hr.end_date, rt.id, rt.name, rt.max_occupancy,
+                          hr.included_meal_type_code, mt.name, h.name, h.organization_id,
+                          h.star_rating, h.giata_city_id, s.name),
+                ',' ORDER BY hr.id
+            )) as checksum
+    """ + RATES_FROM + """
+        GROUP BY h.id, s.id
+    """
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query)
+            return cur.fetchall()
+
+
+def get_existing_rate_keys(keys: list) -> list:
+    """
+    Get which of the given rate keys already exist, in any status.
+
+    hotel_rates has a unique index on (organization_id, hotel_id, room_type_id,
+    supplier_id, start_date, end_date, occupancy) across all statuses, so
+    inactive and pending rates block new rows with the same key as well.
+
+    Args:
+        keys: dicts with those columns (dates as date or YYYY-MM-DD)
+
+    Returns:
+        The existing keys, as rows with the same columns
+    """
+    if not keys:
+        return []
+
+    columns = ["organization_id", "hotel_id", "room_type_id", "supplier_id", "start_date", "end_date", "occupancy"]
+    query = """
+        SELECT DISTINCT
+            hr.organization_id,
+            hr.hotel_id,
+            hr.room_type_id,
+            hr.supplier_id,
+            hr.start_date,
+            hr.end_date,
+            hr.occupancy
+        FROM hotel_rates hr
+        JOIN unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::uuid[], %s::date[], %s::date[], %s::text[])
+            AS k(organization_id, hotel_id, room_type_id, supplier_id, start_date, end_date, occupancy)
+            USING (organization_id, hotel_id, room_type_id, supplier_id, start_date, end_date, occupancy)
+    """
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, [[k[col] for k in keys] for col in columns])
+            return cur.fetchall()
+
+
+def get_gap_intervals(
+    start_date: date,
+    end_date: date,
+    exclusions: list,
+    required_boards: list,
+    required_occupancies: list,
+    city_filter: str = None,
+    hotel_filter: str = None,
+    supplier_filter: str = None,
+    star_filter: int = None,
+    extra_rates: list = None,
+) -> list:
+    """
+    Compute date, board and occupancy gaps inside PostgreSQL.
+
+    Server-side equivalent of CoverageIndex.find_gaps: rate periods are
+    aggregated into per-hotel datemultiranges with range_agg and subtracted
+    from the analysis window, so only the gap intervals leave the database.
+    Requires PostgreSQL 14+ (multiranges).
+
+    Args:
+        start_date: Analysis window start
+        end_date: Analysis window end
+        exclusions: Periods to skip (list of {'start', 'end'} or ExclusionSet)
+        required_boards: Board names from BOARD_EQUIVALENTS
+        required_occupancies: Occupancy names from REQUIRED_OCCUPANCIES
+        city_filter: Filter by city name ("Makkah" or "Madinah")
+        hotel_filter: Filter by hotel ID
+        supplier_filter: Filter by supplier ID
+        star_filter: Filter by star rating
+        extra_rates: Rates not yet active in the database (e.g. created this
+            session) to count as coverage, as dicts with hotel_id,
+            supplier_id, start_date, end_date, board and capacity
+
+    Returns:
+        Gap rows with the gap report columns, ordered by hotel, type and start
+    """
+    if end_date < start_date:
+        return []
+
+    # One row per requirement and accepted board/capacity; board equivalents
+    # share a position so their coverage is merged
+    requirements = []
+    for position, board_name in enumerate(required_boards):
+        for board in BOARD_EQUIVALENTS.get(board_name, [board_name]):
+            requirements.append((position, "board", f"Missing: {board_name}", board, None))
+    for position, (cap_name, cap_value) in enumerate(REQUIRED_OCCUPANCIES.items(), len(required_boards)):
+        if cap_name in required_occupancies:
+            requirements.append((position, "occupancy", f"Missing: {cap_name} ({cap_value})", None, cap_value))
+    requirement_params = [list(column) for column in zip(*requirements)] or [[], [], [], [], []]
+
+    excluded = ExclusionSet.coerce(exclusions).intervals
+    extra_rates = extra_rates or []
+
+    filters, filter_params = _rates_filters(
+        start_date, end_date, city_filter, hotel_filter, supplier_filter, star_filter=star_filter,
+    )
+
+    query = """
+        WITH rates AS (
+            SELECT
+                h.id as hotel_id,
+                s.name as supplier_name,
+                rt.max_occupancy as capacity,
+                COALESCE(mt.name, 'Room Only') as board,
+                daterange(hr.start_date, hr.end_date, '[]') as span
+    """ + RATES_FROM + filters + """
+            UNION ALL
+            SELECT x.hotel_id, s.name, x.capacity, x.board, daterange(x.start_date, x.end_date, '[]')
+            FROM unnest(%s::uuid[], %s::uuid[], %s::date[], %s::date[], %s::text[], %s::int[])
+                AS x(hotel_id, supplier_id, start_date, end_date, board, capacity)
+            JOIN suppliers s ON s.id = x.supplier_id
+        ),
+        active AS (
+            SELECT datemultirange(daterange(%s, %s, '[]')) - COALESCE(
+                (SELECT range_agg(daterange(e.start_date, e.end_date, '[]'))
+                 FROM unnest(%s::date[], %s::date[]) AS e(start_date, end_date)),
+                '{}'::datemultirange
+            ) as days
+        ),
+        requirements AS (
+            SELECT * FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::int[])
+                AS r(position, gap_type, detail, board, capacity)
+        ),
+        hotel_cover AS (
+            SELECT
+                r.hotel_id,
+                string_agg(DISTINCT r.supplier_name COLLATE "C", ', ' ORDER BY r.supplier_name COLLATE "C") as supplier_name,
+                range_agg(r.span) * (SELECT days FROM active) as days
+            FROM rates r
+            GROUP BY r.hotel_id
+        ),
+        requirement_cover AS (
+            SELECT r.hotel_id, q.position, range_agg(r.span) as days
+            FROM rates r
+            JOIN requirements q ON q.board = r.board OR q.capacity = r.capacity
+            GROUP BY r.hotel_id, q.position
+        ),
+        missing AS (
+            SELECT c.hotel_id, 'date' as gap_type, 'No availability' as detail, a.days - c.days as days
+            FROM hotel_cover c CROSS JOIN active a
+            UNION ALL
+            SELECT c.hotel_id, q.gap_type, q.detail, c.days - COALESCE(rc.days, '{}'::datemultirange)
+            FROM hotel_cover c
+            CROSS JOIN (SELECT DISTINCT position, gap_type, detail FROM requirements) q
+            LEFT JOIN requirement_cover rc ON rc.hotel_id = c.hotel_id AND rc.position = q.position
+        )
+        SELECT
+            h.id as hotel_id,
+            h.organization_id,
+            h.name as hotel_name,
+            CASE h.giata_city_id
+                WHEN '20300' THEN 'Makkah'
+                WHEN '20299' THEN 'Madinah'
+            END as city,
+            h.star_rating,
+            c.supplier_name,
+            m.gap_type,
+            m.detail,
+            lower(g.gap) as gap_start,
+            upper(g.gap) - 1 as gap_end,
+            upper(g.gap) - lower(g.gap) as duration_days
+        FROM missing m
+        CROSS JOIN LATERAL unnest(m.days) AS g(gap)
+        JOIN hotel_cover c ON c.hotel_id = m.hotel_id
+        JOIN hotels h ON h.id = m.hotel_id
+        ORDER BY h.name COLLATE "C", m.gap_type, gap_start
+    """
+    params = filter_params + [
+        [r["hotel_id"] for r in extra_rates],
+        [r["supplier_id"] for r in extra_rates],
+        [r["start_date"] for r in extra_rates],
+        [r["end_date"] for r in extra_rates],
+        [r["board"] for r in extra_rates],
+        [r["capacity"] for r in extra_rates],
+        start_date,
+        end_date,
+        [start for start, _ in excluded],
+        [end for _, end in excluded],
+    ] + requirement_params
 
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -190,3 +648,35 @@ def get_room_types_by_hotel(hotel_id: str) -> list:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, [hotel_id])
             return cur.fetchall()
+
+
+def get_room_types_for_hotels(hotel_ids: list) -> dict:
+    """
+    Get room types for many hotels in one query.
+
+    Returns:
+        dict mapping each requested hotel_id to its room types (id, name,
+        max_occupancy), ordered by name; hotels without room types map to []
+    """
+    room_types = {hotel_id: [] for hotel_id in hotel_ids}
+    if not room_types:
+        return room_types
+
+    query = """
+        SELECT rt.hotel_id, rt.id, rt.name, rt.max_occupancy
+        FROM room_types rt
+        WHERE rt.hotel_id = ANY(%s::uuid[])
+        ORDER BY rt.hotel_id, rt.name
+    """
+
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, [list(room_types)])
+            for row in cur.fetchall():
+                room_types[row["hotel_id"]].append({
+                    "id": row["id"],
+                    "name": row["name"],
+                    "max_occupancy": row["max_occupancy"],
+                })
+
+    return room_types
@@ -0,0 +1,443 @@
+"""
+Excel rate template export for filling gaps, and import of filled templates.
+"""
+
+import tempfile
+from datetime import date, datetime
+
+import polars as pl
+from openpyxl import Workbook, load_workbook
+
+from gap_rules import OCCUPANCY_CODES, REQUIRED_OCCUPANCIES
+
+
+# Gaps_Template columns, one row per room type per gap
+TEMPLATE_HEADERS = [
+    "hotel_id", "organization_id", "hotel_name", "city", "star_rating",
+    "gap_type", "detail", "start_date", "end_date", "duration_days",
+    "supplier_name", "room_type_id", "room_name", "max_occupancy",
+    "supplier_id_to_fill", "occupancy", "weekday_rate", "weekend_rate",
+    "currency", "rate_type", "min_booking_days_in_advance", "num_of_rooms",
+    "included_meal_type_code",
+]
+
+# Pre-filled values for template columns; other columns without data are left empty
+TEMPLATE_DEFAULTS = {
+    "currency": "SAR",
+    "rate_type": "subject_to_availability",
+}
+
+RATE_TYPES = ["subject_to_availability", "guaranteed"]
+
+# Columns of the unique index on hotel_rates (see db.get_existing_rate_keys)
+RATE_KEY_COLUMNS = [
+    "organization_id", "hotel_id", "room_type_id", "supplier_id",
+    "start_date", "end_date", "occupancy",
+]
+
+# Template columns a user fills in; a row with none of them set is left unfilled
+FILL_COLUMNS = ["supplier_id_to_fill", "occupancy", "weekday_rate", "weekend_rate"]
+
+# Template columns holding UUIDs; they are checked before any of them reaches a query
+UUID_COLUMNS = ["organization_id", "hotel_id", "room_type_id", "supplier_id_to_fill"]
+
+
+def expand_gaps_by_room_type(gaps_df: pl.DataFrame, room_types: dict) -> pl.DataFrame:
+    """
+    Expand gaps into one template row per room type of the gap's hotel.
+
+    Gaps of hotels without room types keep a single row with empty room
+    columns. Rows follow gaps_df order, then room type order.
+    """
+    rooms = pl.DataFrame(
+        [
+            (hotel_id, position, str(rt["id"]), rt["name"], rt["max_occupancy"])
+            for hotel_id, hotel_room_types in room_types.items()
+            for position, rt in enumerate(hotel_room_types)
+        ],
+        schema={
+            "hotel_id": pl.String,
+            "room_position": pl.Int64,
+            "room_type_id": pl.String,
+            "room_name": pl.String,
+            "max_occupancy": pl.Int64,
+        },
+        orient="row",
+    )
+
+    expanded = (
+        gaps_df.with_row_index("gap_position")
+        .join(rooms, on="hotel_id", how="left")
+        .sort(["gap_position", "room_position"], nulls_last=True)
+        .with_columns([
+            pl.col("gap_start").dt.strftime("%Y-%m-%d").alias("start_date"),
+            pl.col("gap_end").dt.strftime("%Y-%m-%d").alias("end_date"),
+        ])
+    )
+
+    columns = []
+    for col in TEMPLATE_HEADERS:
+        if col in TEMPLATE_DEFAULTS:
+            columns.append(pl.lit(TEMPLATE_DEFAULTS[col]).alias(col))
+        elif col in expanded.columns:
+            columns.append(pl.col(col))
+        else:
+            columns.append(pl.lit(None, dtype=pl.String).alias(col))
+
+    return expanded.select(columns)
+
+
+def build_rate_template(
+    gaps_df: pl.DataFrame,
+    room_types: dict,
+    suppliers: list,
+    meal_types: list,
+) -> bytes:
+    """
+    Build the gap rate template workbook.
+
+    Sheets are written in openpyxl write-only mode, appending rows as they are
+    produced, so no cell objects are kept in memory. The workbook is streamed
+    to a temporary file and only read back as bytes at the end.
+
+    Args:
+        gaps_df: Gap report from the gap engine
+        room_types: hotel_id -> room types (see db.get_room_types_for_hotels)
+        suppliers: Supplier rows with 'id' and 'name'
+        meal_types: Meal type rows with 'code' and 'name'
+
+    Returns:
+        The .xlsx file contents
+    """
+    wb = Workbook(write_only=True)
+
+    # Sheet 1: Gap Template - expanded by room type (one row per room type per gap)
+    ws_gaps = wb.create_sheet("Gaps_Template")
+    ws_gaps.append(TEMPLATE_HEADERS)
+    for row in expand_gaps_by_room_type(gaps_df, room_types).iter_rows():
+        ws_gaps.append(row)
+
+    # Sheet 2: Suppliers Reference
+    ws_suppliers = wb.create_sheet("Suppliers")
+    ws_suppliers.append(["supplier_id", "supplier_name"])
+    for supplier in suppliers:
+        ws_suppliers.append([str(supplier["id"]), supplier["name"]])
+
+    # Sheet 3: Room Types Reference
+    ws_rooms = wb.create_sheet("Room_Types")
+    ws_rooms.append(["hotel_id", "hotel_name", "room_type_id", "room_name", "max_occupancy"])
+    for hotel_id, hotel_name in gaps_df.select(["hotel_id", "hotel_name"]).unique(maintain_order=True).iter_rows():
+        for rt in room_types.get(hotel_id, []):
+            ws_rooms.append([hotel_id, hotel_name, str(rt["id"]), rt["name"], rt["max_occupancy"]])
+
+    # Sheet 4: Meal Types Reference
+    ws_meals = wb.create_sheet("Meal_Types")
+    ws_meals.append(["meal_type_code", "meal_type_name"])
+    for mt in meal_types:
+        ws_meals.append([mt["code"], mt["name"]])
+
+    # Sheet 5: Occupancy Codes Reference
+    ws_occ = wb.create_sheet("Occupancy_Codes")
+    ws_occ.append(["occupancy_code", "occupancy_name", "capacity"])
+    for name, code in OCCUPANCY_CODES.items():
+        ws_occ.append([code, name, REQUIRED_OCCUPANCIES[name]])
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        return tmp.read()
+
+
+def read_rate_template(source) -> pl.DataFrame:
+    """
+    Read the Gaps_Template sheet of a filled rate template.
+
+    The workbook is opened in read-only mode, so rows are streamed from the
+    file instead of loaded as cell objects. All values are read as text
+    (dates as YYYY-MM-DD, whole numbers without a decimal point); typing is
+    left to validate_rate_rows. Rows that are completely empty are dropped.
+
+    Args:
+        source: Path or file-like object of the .xlsx file
+
+    Returns:
+        DataFrame with the TEMPLATE_HEADERS columns plus 'row', the sheet row number
+
+    Raises:
+        ValueError: if the sheet or any template column is missing
+    """
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if "Gaps_Template" not in wb.sheetnames:
+            raise ValueError("Workbook has no Gaps_Template sheet")
+        rows = wb["Gaps_Template"].iter_rows(values_only=True)
+        header = [_cell_text(value) for value in next(rows, ())]
+        missing = [col for col in TEMPLATE_HEADERS if col not in header]
+        if missing:
+            raise ValueError(f"Gaps_Template is missing columns: {', '.join(missing)}")
+
+        positions = [header.index(col) for col in TEMPLATE_HEADERS]
+        records = []
+        for row_number, row in enumerate(rows, start=2):
+            values = [_cell_text(row[i]) if i < len(row) else None for i in positions]
+            if any(value is not None for value in values):
+                records.append([row_number] + values)
+    finally:
+        wb.close()
+
+    return pl.DataFrame(
+        records,
+        schema={"row": pl.Int64, **{col: pl.String for col in TEMPLATE_HEADERS}},
+        orient="row",
+    )
+
+
+def template_hotel_ids(template_df: pl.DataFrame) -> tuple:
+    """Sorted distinct hotel IDs of a template that are valid UUIDs, for loading their room types."""
+    return tuple(sorted(template_df.select(_uuid_text(pl.col("hotel_id")))["hotel_id"].drop_nulls().unique()))
+
+
+def validate_rate_rows(
+    template_df: pl.DataFrame,
+    hotels: list,
+    room_types: dict,
+    suppliers: list,
+    meal_types: list,
+) -> pl.DataFrame:
+    """
+    Type and check the filled rows of a rate template.
+
+    All checks are column expressions over the whole frame. Lookups against
+    reference data are joins, not per-row loops. Rows with none of the
+    FILL_COLUMNS set are dropped as unfilled. Conflicts with existing rates
+    are checked separately by mark_existing_rates.
+
+    UUID_COLUMNS are matched against the UUID pattern and written back in
+    canonical (lower-case, hyphenated) form, so only valid, normalized IDs
+    reach the database lookups. Rows whose organization_id is not the
+    hotel's organization are rejected. hotel_name, city and star_rating
+    come from the hotels reference, not from the sheet, so an edited cell
+    can't split a hotel in the gap report.
+
+    Args:
+        template_df: Rows from read_rate_template
+        hotels: Hotel rows with 'hotel_id', 'organization_id', 'hotel_name',
+            'city' and 'star_rating' (see db.get_hotels)
+        room_types: hotel_id -> room types (see db.get_room_types_for_hotels)
+        suppliers: Supplier rows with 'id' and 'name'
+        meal_types: Meal type rows with 'code' and 'name'
+
+    Returns:
+        One row per filled template row with typed rate columns,
+        'supplier_id' and 'supplier_name' of the filling supplier,
+        'hotel_name', 'city', 'star_rating', 'room_name', 'capacity' and
+        'board' resolved from the reference data,
+        and 'error': None for valid rows, otherwise the failed checks joined by "; "
+    """
+    hotel_info = pl.DataFrame(
+        [
+            (
+                str(h["hotel_id"]),
+                str(h["organization_id"]) if h.get("organization_id") else None,
+                h.get("hotel_name"),
+                h.get("city"),
+                h.get("star_rating"),
+            )
+            for h in hotels
+        ],
+        schema={
+            "hotel_id": pl.String,
+            "hotel_organization_id": pl.String,
+            "hotel_name_db": pl.String,
+            "city_db": pl.String,
+            "star_rating_db": pl.Int64,
+        },
+        orient="row",
+    ).unique("hotel_id")
+    rooms = pl.DataFrame(
+        [
+            (hotel_id, str(rt["id"]), rt["name"], rt["max_occupancy"])
+            for hotel_id, hotel_room_types in room_types.items()
+            for rt in hotel_room_types
+        ],
+        schema={"hotel_id": pl.String, "room_type_id": pl.String, "room_name_db": pl.String, "capacity": pl.Int64},
+        orient="row",
+    )
+    supplier_names = pl.DataFrame(
+        [(str(s["id"]), s["name"]) for s in suppliers],
+        schema={"supplier_id": pl.String, "supplier_name_db": pl.String},
+        orient="row",
+    )
+    meals = pl.DataFrame(
+        [(mt["code"], mt["name"]) for mt in meal_types],
+        schema={"included_meal_type_code": pl.String, "board": pl.String},
+        orient="row",
+    )
+    occupancy_codes = {**OCCUPANCY_CODES, **{code: code for code in OCCUPANCY_CODES.values()}}
+
+    df = (
+        template_df.filter(pl.any_horizontal(pl.col(FILL_COLUMNS).is_not_null()))
+        .with_columns([
+            _uuid_text(pl.col(col)).alias(f"{col}_uuid")
+            for col in UUID_COLUMNS
+        ])
+        .with_columns([
+            # Canonical IDs where valid; invalid ones keep their text for the error listing
+            pl.coalesce(pl.col(f"{col}_uuid"), pl.col(col)).alias(col)
+            for col in ["organization_id", "hotel_id", "room_type_id"]
+        ] + [
+            pl.coalesce(pl.col("supplier_id_to_fill_uuid"), pl.col("supplier_id_to_fill")).alias("supplier_id"),
+            pl.col("occupancy").replace_strict(occupancy_codes, default=None, return_dtype=pl.String).alias("occupancy_code"),
+            pl.col("weekday_rate").cast(pl.Float64, strict=False).alias("weekday_rate_value"),
+            pl.col("weekend_rate").cast(pl.Float64, strict=False).alias("weekend_rate_value"),
+            pl.col("start_date").str.to_date("%Y-%m-%d", strict=False).alias("start_date_value"),
+            pl.col("end_date").str.to_date("%Y-%m-%d", strict=False).alias("end_date_value"),
+            pl.col("min_booking_days_in_advance").cast(pl.Int64, strict=False).alias("min_booking_value"),
+            pl.col("num_of_rooms").cast(pl.Int64, strict=False).alias("num_of_rooms_value"),
+        ])
+        .join(hotel_info, on="hotel_id", how="left")
+        .join(rooms, on=["hotel_id", "room_type_id"], how="left")
+        .join(supplier_names, on="supplier_id", how="left")
+        .join(meals, on="included_meal_type_code", how="left")
+    )
+
+    checks = [
+        (pl.col("organization_id").is_null() | pl.col("hotel_id").is_null(), "hotel_id and organization_id are required"),
+        *[
+            (pl.col(col).is_not_null() & pl.col(f"{col}_uuid").is_null(), f"{col} is not a valid UUID")
+            for col in UUID_COLUMNS
+        ],
+        (pl.col("hotel_id_uuid").is_not_null() & pl.col("hotel_organization_id").is_null(), "unknown hotel_id"),
+        (
+            pl.col("organization_id_uuid").is_not_null() & pl.col("hotel_organization_id").is_not_null()
+            & (pl.col("organization_id_uuid") != pl.col("hotel_organization_id")),
+            "organization_id is not the hotel's organization",
+        ),
+        (pl.col("room_type_id").is_null(), "room_type_id is required"),
+        (
+            pl.col("hotel_id_uuid").is_not_null() & pl.col("room_type_id_uuid").is_not_null() & pl.col("capacity").is_null(),
+            "room_type_id is not a room type of this hotel",
+        ),
+        (pl.col("supplier_id").is_null(), "supplier_id_to_fill is required"),
+        (pl.col("supplier_id_to_fill_uuid").is_not_null() & pl.col("supplier_name_db").is_null(), "unknown supplier_id_to_fill"),
+        (pl.col("occupancy_code").is_null(), f"occupancy must be one of {', '.join(OCCUPANCY_CODES.values())}"),
+        (pl.col("start_date_value").is_null() | pl.col("end_date_value").is_null(), "start_date and end_date must be YYYY-MM-DD"),
+        (pl.col("start_date_value") > pl.col("end_date_value"), "start_date is after end_date"),
+        (pl.col("weekday_rate_value").is_null() | (pl.col("weekday_rate_value") <= 0), "weekday_rate must be a number > 0"),
+        (pl.col("weekend_rate_value").is_null() | (pl.col("weekend_rate_value") <= 0), "weekend_rate must be a number > 0"),
+        (pl.col("currency").is_null(), "currency is required"),
+        (~pl.col("rate_type").is_in(RATE_TYPES).fill_null(False), f"rate_type must be one of {', '.join(RATE_TYPES)}"),
+        (pl.col("included_meal_type_code").is_null() | pl.col("board").is_null(), "unknown included_meal_type_code"),
+        (pl.col("min_booking_days_in_advance").is_not_null() & pl.col("min_booking_value").is_null(), "min_booking_days_in_advance must be a whole number"),
+        (pl.col("num_of_rooms").is_not_null() & pl.col("num_of_rooms_value").is_null(), "num_of_rooms must be a whole number"),
+        (
+            pl.int_range(pl.len()).over([
+                "organization_id", "hotel_id", "room_type_id", "supplier_id",
+                "start_date_value", "end_date_value", "occupancy_code",
+            ]) > 0,
+            "duplicate of an earlier row in this file",
+        ),
+    ]
+    errors = pl.concat_str(
+        [pl.when(failed.fill_null(False)).then(pl.lit(message)) for failed, message in checks],
+        separator="; ",
+        ignore_nulls=True,
+    )
+
+    return df.sort("row").select([
+        "row",
+        "organization_id",
+        "hotel_id",
+        pl.col("hotel_name_db").alias("hotel_name"),
+        pl.col("city_db").alias("city"),
+        pl.col("star_rating_db").alias("star_rating"),
+        "room_type_id",
+        pl.col("room_name_db").alias("room_name"),
+        "capacity",
+        "supplier_id",
+        pl.col("supplier_name_db").alias("supplier_name"),
+        pl.col("start_date_value").alias("start_date"),
+        pl.col("end_date_value").alias("end_date"),
+        pl.col("occupancy_code").alias("occupancy"),
+        pl.col("weekday_rate_value").alias("weekday_rate"),
+        pl.col("weekend_rate_value").alias("weekend_rate"),
+        "currency",
+        "rate_type",
+        "included_meal_type_code",
+        "board",
+        pl.col("min_booking_value").alias("min_booking_days_in_advance"),
+        pl.col("num_of_rooms_value").alias("num_of_rooms"),
+        pl.when(errors != "").then(errors).alias("error"),
+    ])
+
+
+def rate_keys(validated_df: pl.DataFrame) -> list:
+    """Unique keys (RATE_KEY_COLUMNS) of the valid rows, for db.get_existing_rate_keys."""
+    return validated_df.filter(pl.col("error").is_null()).select(RATE_KEY_COLUMNS).unique().to_dicts()
+
+
+def mark_existing_rates(validated_df: pl.DataFrame, existing_keys: list) -> pl.DataFrame:
+    """Flag rows whose key matches an existing rate, which the unique index would reject."""
+    existing = pl.DataFrame(
+        [tuple(str(row[col]) for col in RATE_KEY_COLUMNS) for row in existing_keys],
+        schema={col: pl.String for col in RATE_KEY_COLUMNS},
+        orient="row",
+    ).with_columns([
+        pl.col("start_date").str.to_date("%Y-%m-%d"),
+        pl.col("end_date").str.to_date("%Y-%m-%d"),
+        pl.lit(True).alias("exists"),
+    ]).unique()
+
+    message = "a rate with this hotel, room type, supplier, dates and occupancy already exists"
+    # Joins don't promise to keep the left order on every Polars version, so restore it by row
+    return validated_df.join(existing, on=RATE_KEY_COLUMNS, how="left").sort("row").with_columns(
+        pl.when(pl.col("exists").is_null()).then(pl.col("error"))
+        .when(pl.col("error").is_null()).then(pl.lit(message))
+        .otherwise(pl.concat_str([pl.col("error"), pl.lit(message)], separator="; "))
+        .alias("error")
+    ).drop("exists")
+
+
+def rate_insert_rows(valid_df: pl.DataFrame) -> list:
+    """Keyword arguments for graphql_client.build_rate_object, one dict per validated row."""
+    return valid_df.select([
+        "organization_id",
+        "hotel_id",
+        "room_type_id",
+        "supplier_id",
+        pl.col("start_date").dt.strftime("%Y-%m-%d"),
+        pl.col("end_date").dt.strftime("%Y-%m-%d"),
+        "occupancy",
+        "weekday_rate",
+        "weekend_rate",
+        "currency",
+        "rate_type",
+        "included_meal_type_code",
+        "min_booking_days_in_advance",
+        "num_of_rooms",
+    ]).to_dicts()
+
+
+def _uuid_text(text: pl.Expr) -> pl.Expr:
+    """Canonical text of UUIDs, hyphenated or as 32 hex digits; null where text is not a UUID."""
+    text = text.str.strip_chars().str.to_lowercase()
+    hex_digits = text.str.replace_all("-", "", literal=True)
+    is_uuid = text.str.contains(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32})$")
+    return pl.when(is_uuid).then(pl.concat_str(
+        [hex_digits.str.slice(start, length) for start, length in [(0, 8), (8, 4), (12, 4), (16, 4), (20, 12)]],
+        separator="-",
+    ))
+
+
+def _cell_text(value):
+    """Cell value as stripped text; None for empty cells."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    return text or None
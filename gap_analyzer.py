@@ -2,70 +2,58 @@
 Gap detection logic for hotel coverage analysis.
 """
 
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import polars as pl
 from datetime import date, timedelta
 from typing import Optional
 
+from gap_rules import BOARD_EQUIVALENTS, REQUIRED_OCCUPANCIES, ExclusionSet
 
-# Board equivalence mapping - having any of these satisfies the requirement
-BOARD_EQUIVALENTS = {
-    "Room Only": ["Room Only"],
-    "Breakfast": ["Breakfast Included", "Sohour Included"],
-    "Lunch": ["Lunch Included", "Iftar Included"],
-    "Dinner": ["Dinner Included", "Iftar Included"],
-    "Half Board": ["Half Board"],
-    "Full Board": ["Full Board"],
-}
-
-# Required occupancies (capacity)
-REQUIRED_OCCUPANCIES = {
-    "Double": 2,
-    "Triple": 3,
-    "Quad": 4,
-}
-
-# Occupancy codes for rate creation (maps display name to DB code)
-OCCUPANCY_CODES = {
-    "Double": "DBL",
-    "Triple": "TRP",
-    "Quad": "QAD",
-}
-
-# Board name to meal type code mapping for rate creation
-BOARD_TO_MEAL_CODE = {
-    "Room Only": "ROOM_ONLY",
-    "Breakfast": "BREAKFAST_INCLUDED",
-    "Lunch": "LUNCH_INCLUDED",
-    "Dinner": "DINNER_INCLUDED",
-    "Half Board": "HALF_BOARD",
-    "Full Board": "FULL_BOARD",
-}
-
-
-def rates_to_dataframe(rates: list) -> pl.DataFrame:
-    """Convert database rates to Polars DataFrame."""
-    if not rates:
-        return pl.DataFrame({
-            "hotel_id": [],
-            "organization_id": [],
-            "hotel_name": [],
-            "city": [],
-            "star_rating": [],
-            "room_type_id": [],
-            "room_name": [],
-            "capacity": [],
-            "start_date": [],
-            "end_date": [],
-            "board": [],
-            "supplier_id": [],
-            "supplier_name": [],
-        })
 
-    return pl.DataFrame([dict(r) for r in rates])
+def _default_gap_workers() -> int:
+    """CPUs this process may run on (not the host's count), at most 4."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return max(1, min(cpus, 4))
+
+
+# Threads for CoverageIndex.find_gaps; a partition gets at least GAP_PARTITION_MIN_HOTELS hotels
+GAP_WORKERS = int(os.getenv("GAP_WORKERS", str(_default_gap_workers())))
+GAP_PARTITION_MIN_HOTELS = int(os.getenv("GAP_PARTITION_MIN_HOTELS", "250"))
+
+# One pool of GAP_WORKERS threads shared by every find_gaps call in the process
+_gap_pool = None
+_gap_pool_lock = threading.Lock()
+
+
+def get_gap_pool() -> ThreadPoolExecutor:
+    """Get or create the shared gap partition thread pool."""
+    global _gap_pool
+    with _gap_pool_lock:
+        if _gap_pool is None:
+            _gap_pool = ThreadPoolExecutor(max_workers=GAP_WORKERS, thread_name_prefix="gap-partition")
+        return _gap_pool
+
+
+# Gap report row order; hotel_id and detail only break ties, so the order is total
+GAP_REPORT_ORDER = ["hotel_name", "gap_type", "gap_start", "hotel_id", "detail"]
 
 
 def expand_date_ranges(df: pl.DataFrame) -> pl.DataFrame:
-    """Expand start_date/end_date into individual daily rows."""
+    """
+    Expand start_date/end_date into individual daily rows.
+
+    Built columnar with date_ranges + explode; repeated strings (hotel_name,
+    city, room_name, board, supplier_name) are kept as Categorical.
+    """
     if len(df) == 0:
         return pl.DataFrame({
             "date": [],
@@ -81,227 +69,414 @@ def expand_date_ranges(df: pl.DataFrame) -> pl.DataFrame:
             "supplier_name": [],
         })
 
-    expanded_rows = []
-
-    for row in df.iter_rows(named=True):
-        start_date = row["start_date"]
-        end_date = row["end_date"]
-        current_date = start_date
-
-        while current_date <= end_date:
-            expanded_rows.append({
-                "date": current_date,
-                "hotel_id": str(row["hotel_id"]),
-                "organization_id": str(row["organization_id"]) if row.get("organization_id") else None,
-                "hotel_name": row["hotel_name"],
-                "city": row["city"],
-                "star_rating": row["star_rating"],
-                "room_name": row.get("room_name", ""),
-                "board": row["board"],
-                "capacity": row["capacity"],
-                "supplier_id": str(row["supplier_id"]) if row.get("supplier_id") else None,
-                "supplier_name": row.get("supplier_name", ""),
-            })
-            current_date += timedelta(days=1)
-
-    return pl.DataFrame(expanded_rows)
-
-
-def is_date_excluded(check_date: date, exclusions: list) -> bool:
-    """Check if a date falls within any exclusion period."""
-    for excl in exclusions:
-        if excl["start"] <= check_date <= excl["end"]:
-            return True
-    return False
-
-
-def group_consecutive_dates(dates: list) -> list:
-    """Group consecutive dates into periods."""
-    if not dates:
-        return []
-
-    dates = sorted(dates)
-    periods = []
-    period_start = dates[0]
-    prev_date = dates[0]
-
-    for current_date in dates[1:]:
-        if (current_date - prev_date).days > 1:
-            periods.append({
-                "gap_start": period_start,
-                "gap_end": prev_date,
-                "duration_days": (prev_date - period_start).days + 1,
-            })
-            period_start = current_date
-        prev_date = current_date
-
-    periods.append({
-        "gap_start": period_start,
-        "gap_end": prev_date,
-        "duration_days": (prev_date - period_start).days + 1,
+    # Stringify ID columns once per rate rather than once per day
+    id_columns = []
+    for col in ["hotel_id", "organization_id", "supplier_id"]:
+        if df.schema[col] == pl.Object:
+            id_columns.append(pl.Series(col, [str(v) if v else None for v in df[col]], dtype=pl.String))
+        else:
+            id_columns.append(pl.col(col).cast(pl.String))
+
+    return (
+        df.with_columns(id_columns)
+        .lazy()
+        .with_columns(pl.date_ranges("start_date", "end_date").alias("date"))
+        .explode("date")
+        .select([
+            "date",
+            "hotel_id",
+            "organization_id",
+            pl.col("hotel_name").cast(pl.Categorical),
+            pl.col("city").cast(pl.Categorical),
+            "star_rating",
+            pl.col("room_name").cast(pl.Categorical),
+            pl.col("board").cast(pl.Categorical),
+            "capacity",
+            "supplier_id",
+            pl.col("supplier_name").cast(pl.Categorical),
+        ])
+        .collect()
+    )
+
+
+def date_ordinals(dates) -> np.ndarray:
+    """Dates as int32 day ordinals (days since 1970-01-01, Polars' Date encoding)."""
+    if not isinstance(dates, pl.Series):
+        dates = pl.Series(list(dates), dtype=pl.Date)
+    return dates.cast(pl.Date).to_physical().to_numpy().astype(np.int32)
+
+
+def periods_frame(series_ids: np.ndarray, first_days: np.ndarray, last_days: np.ndarray) -> pl.DataFrame:
+    """Columnar periods from int32 day ordinals: series_id, gap_start, gap_end, duration_days."""
+    first_days = np.asarray(first_days, dtype=np.int32)
+    last_days = np.asarray(last_days, dtype=np.int32)
+    return pl.DataFrame({
+        "series_id": np.asarray(series_ids, dtype=np.int64),
+        "gap_start": pl.Series(first_days).cast(pl.Date),
+        "gap_end": pl.Series(last_days).cast(pl.Date),
+        "duration_days": (last_days.astype(np.int64) - first_days + 1),
+    })
+
+
+def exclusion_mask(exclusions, start_date: date, n_days: int) -> np.ndarray:
+    """Bool mask over n_days from start_date, True on excluded days (exclusions: dicts or ExclusionSet)."""
+    mask = np.zeros(n_days, dtype=bool)
+    for first, last in ExclusionSet.coerce(exclusions).day_ranges(start_date, n_days):
+        mask[first:last + 1] = True
+    return mask
+
+
+def _empty_gaps_frame() -> pl.DataFrame:
+    """Empty gap report with the standard columns."""
+    return pl.DataFrame({
+        "hotel_id": [],
+        "organization_id": [],
+        "hotel_name": [],
+        "city": [],
+        "star_rating": [],
+        "supplier_name": [],
+        "gap_type": [],
+        "detail": [],
+        "gap_start": [],
+        "gap_end": [],
+        "duration_days": [],
     })
 
-    return periods
 
+def gaps_to_dataframe(gaps: list) -> pl.DataFrame:
+    """Convert gap rows (see db.get_gap_intervals) to a gap report DataFrame."""
+    if not gaps:
+        return _empty_gaps_frame()
 
-def find_hotel_date_gaps(
-    daily_df: pl.DataFrame,
+    return pl.DataFrame([dict(g) for g in gaps]).with_columns([
+        pl.col("hotel_id").cast(pl.String),
+        pl.col("organization_id").cast(pl.String),
+        pl.col("duration_days").cast(pl.Int64),
+    ]).select(_empty_gaps_frame().columns).sort(GAP_REPORT_ORDER)
+
+
+def patch_hotel_gaps(
+    gaps_df: pl.DataFrame,
+    rates_df: pl.DataFrame,
     hotel_id: str,
-    organization_id: str,
-    hotel_name: str,
-    city: str,
-    star_rating: int,
-    suppliers: list,
+    span_start: date,
+    span_end: date,
     start_date: date,
     end_date: date,
     exclusions: list,
-) -> list:
-    """Find periods where hotel has no availability at all."""
-    hotel_data = daily_df.filter(pl.col("hotel_id") == hotel_id)
-    hotel_dates = set(hotel_data["date"].to_list())
-
-    gap_dates = []
-    current = start_date
-    while current <= end_date:
-        if not is_date_excluded(current, exclusions):
-            if current not in hotel_dates:
-                gap_dates.append(current)
-        current += timedelta(days=1)
-
-    periods = group_consecutive_dates(gap_dates)
-    supplier_names = ", ".join(sorted(suppliers))
-
-    return [
-        {
-            "hotel_id": hotel_id,
-            "organization_id": organization_id,
-            "hotel_name": hotel_name,
-            "city": city,
-            "star_rating": star_rating,
-            "supplier_name": supplier_names,
-            "gap_type": "date",
-            "detail": "No availability",
-            "gap_start": p["gap_start"],
-            "gap_end": p["gap_end"],
-            "duration_days": p["duration_days"],
-        }
-        for p in periods
-    ]
-
-
-def find_hotel_board_gaps(
-    daily_df: pl.DataFrame,
-    hotel_id: str,
-    organization_id: str,
-    hotel_name: str,
-    city: str,
-    star_rating: int,
-    suppliers: list,
     required_boards: list,
-    start_date: date,
-    end_date: date,
-    exclusions: list,
-) -> list:
-    """Find periods missing required board types."""
-    hotel_data = daily_df.filter(pl.col("hotel_id") == hotel_id)
-    hotel_dates_set = set(hotel_data["date"].to_list())
-    supplier_names = ", ".join(sorted(suppliers))
+    required_occupancies: list,
+) -> pl.DataFrame:
+    """
+    Recompute one hotel's gaps after its rates changed between span_start and span_end.
+
+    Rows of other hotels, and rows of this hotel away from the span, are kept
+    as they are. The span is widened until none of the kept rows overlaps or
+    touches it, so periods split or merged by the change come out whole.
+
+    Args:
+        gaps_df: Current gap report, computed with the same window and requirements
+        rates_df: Rates including the change (only this hotel's rows are used)
+        hotel_id: Hotel whose rates changed
+        span_start: First day affected by the change
+        span_end: Last day affected by the change
+        start_date, end_date, exclusions, required_boards, required_occupancies:
+            The parameters the report was generated with
+    """
+    hotel_rates = rates_df.filter(pl.col("hotel_id") == hotel_id)
+    hotel_gaps = gaps_df.filter(pl.col("hotel_id") == hotel_id)
 
-    all_gaps = []
+    lo = max(span_start, start_date)
+    hi = min(span_end, end_date)
 
-    for board_name in required_boards:
-        equivalent_boards = BOARD_EQUIVALENTS.get(board_name, [board_name])
+    # Widen [lo, hi] to every existing period of this hotel that overlaps or abuts it
+    while True:
+        touching = hotel_gaps.filter(
+            (pl.col("gap_start") <= hi + timedelta(days=1)) & (pl.col("gap_end") >= lo - timedelta(days=1))
+        )
+        new_lo = min([lo] + touching["gap_start"].to_list())
+        new_hi = max([hi] + touching["gap_end"].to_list())
+        if (new_lo, new_hi) == (lo, hi):
+            break
+        lo, hi = new_lo, new_hi
+
+    kept = gaps_df.filter(~(
+        (pl.col("hotel_id") == hotel_id)
+        & (pl.col("gap_start") <= hi + timedelta(days=1))
+        & (pl.col("gap_end") >= lo - timedelta(days=1))
+    ))
+
+    recomputed = CoverageIndex.from_rates(hotel_rates, lo, hi).find_gaps(
+        exclusions,
+        required_boards,
+        required_occupancies,
+        workers=1,
+    )
+
+    # The change may have added a supplier to this hotel
+    supplier_names = ", ".join(sorted(hotel_rates["supplier_name"].drop_nulls().unique().to_list()))
+    kept = kept.with_columns(
+        pl.when(pl.col("hotel_id") == hotel_id)
+        .then(pl.lit(supplier_names))
+        .otherwise(pl.col("supplier_name"))
+        .alias("supplier_name")
+    )
+
+    if len(recomputed) == 0:
+        return kept
+
+    return pl.concat(
+        [kept, recomputed.select(kept.columns)], how="vertical_relaxed"
+    ).sort(GAP_REPORT_ORDER)
+
+
+class CoverageIndex:
+    """
+    Day-bitmap coverage index over a fixed analysis window.
 
-        # Get dates that have any of the equivalent boards
-        board_dates = set(
-            hotel_data.filter(pl.col("board").is_in(equivalent_boards))["date"].to_list()
+    Holds one bool row per hotel, per (hotel, board) and per (hotel, capacity),
+    keyed by day offset from the window start. Board equivalences, required
+    occupancies and exclusions are only applied in find_gaps, so the same
+    index can be reused when requirements change.
+    """
+
+    def __init__(
+        self,
+        hotels: pl.DataFrame,
+        boards: list,
+        capacities: list,
+        hotel_days: np.ndarray,
+        board_days: np.ndarray,
+        capacity_days: np.ndarray,
+        start_date: date,
+        end_date: date,
+    ):
+        self.hotels = hotels
+        self.boards = boards
+        self.capacities = capacities
+        self.hotel_days = hotel_days
+        self.board_days = board_days
+        self.capacity_days = capacity_days
+        self.start_date = start_date
+        self.end_date = end_date
+        self.n_days = hotel_days.shape[1]
+
+    @classmethod
+    def from_rates(cls, rates_df: pl.DataFrame, start_date: date, end_date: date) -> "CoverageIndex":
+        """Build the index from rate start_date/end_date intervals."""
+        return cls._build(rates_df, rates_df.select([
+            "hotel_id", "start_date", "end_date", "board", "capacity",
+        ]), start_date, end_date)
+
+    @classmethod
+    def from_daily(cls, daily_df: pl.DataFrame, start_date: date, end_date: date) -> "CoverageIndex":
+        """Build the index from expanded daily rows (see expand_date_ranges)."""
+        return cls._build(daily_df, daily_df.select([
+            "hotel_id",
+            pl.col("date").alias("start_date"),
+            pl.col("date").alias("end_date"),
+            "board",
+            "capacity",
+        ]).unique(), start_date, end_date)
+
+    @classmethod
+    def _build(cls, df: pl.DataFrame, spans: pl.DataFrame, start_date: date, end_date: date) -> "CoverageIndex":
+        n_days = max((end_date - start_date).days + 1, 0)
+
+        # One row per hotel, with all its suppliers as one sorted string
+        hotels = df.group_by(["hotel_id", "organization_id", "hotel_name", "city", "star_rating"]).agg([
+            pl.col("supplier_name").drop_nulls().cast(pl.String).unique().sort().str.join(", ")
+        ]).with_columns([
+            pl.col("hotel_name").cast(pl.String),
+            pl.col("city").cast(pl.String),
+        ]).sort("hotel_id").with_row_index("row")
+
+        spans = spans.with_columns(pl.col("board").cast(pl.String)).filter(
+            (pl.col("end_date") >= start_date) & (pl.col("start_date") <= end_date)
+        )
+        boards = sorted(spans["board"].drop_nulls().unique().to_list())
+        capacities = sorted(spans["capacity"].drop_nulls().unique().to_list())
+
+        # Day offsets of each span, clipped to the window
+        spans = spans.join(hotels.select(["hotel_id", "row"]), on="hotel_id").select([
+            pl.col("row").cast(pl.Int64),
+            (pl.max_horizontal(pl.col("start_date"), pl.lit(start_date)) - pl.lit(start_date))
+            .dt.total_days().alias("first"),
+            (pl.min_horizontal(pl.col("end_date"), pl.lit(end_date)) - pl.lit(start_date))
+            .dt.total_days().alias("last"),
+            pl.col("board").replace_strict(boards, list(range(len(boards))), default=-1).alias("board_pos"),
+            pl.col("capacity").replace_strict(capacities, list(range(len(capacities))), default=-1).alias("cap_pos"),
+        ]).filter(pl.col("first") <= pl.col("last"))
+
+        rows = spans["row"].to_numpy()
+        first = spans["first"].to_numpy()
+        last = spans["last"].to_numpy()
+        board_pos = spans["board_pos"].to_numpy()
+        cap_pos = spans["cap_pos"].to_numpy()
+
+        n_hotels = len(hotels)
+        n_boards = len(boards)
+        n_caps = len(capacities)
+
+        has_board = board_pos >= 0
+        has_cap = cap_pos >= 0
+
+        hotel_days = _paint_spans(n_hotels, n_days, rows, first, last)
+        board_days = _paint_spans(
+            n_hotels * n_boards, n_days,
+            rows[has_board] * n_boards + board_pos[has_board], first[has_board], last[has_board],
+        ).reshape(n_hotels, n_boards, n_days)
+        capacity_days = _paint_spans(
+            n_hotels * n_caps, n_days,
+            rows[has_cap] * n_caps + cap_pos[has_cap], first[has_cap], last[has_cap],
+        ).reshape(n_hotels, n_caps, n_days)
+
+        return cls(hotels, boards, capacities, hotel_days, board_days, capacity_days, start_date, end_date)
+
+    def find_gaps(
+        self,
+        exclusions: list,
+        required_boards: list,
+        required_occupancies: list,
+        hotel_filter: Optional[str] = None,
+        city_filter: Optional[str] = None,
+        workers: int = GAP_WORKERS,
+    ) -> pl.DataFrame:
+        """
+        Find date, board and occupancy gaps for the indexed hotels.
+
+        With workers > 1 and enough hotels, hotels are partitioned by a hash
+        of hotel_id and the partitions are analyzed on the shared gap pool
+        (at most GAP_WORKERS at a time, across concurrent reports). NumPy
+        and Polars release the GIL in the bulk work, and the threads share
+        the index instead of copying its bitmaps into other processes. The
+        result is the same as a serial run: partitions are merged in the
+        total GAP_REPORT_ORDER.
+        """
+        hotels = self.hotels
+
+        if city_filter and city_filter != "All":
+            hotels = hotels.filter(pl.col("city") == city_filter)
+
+        if hotel_filter:
+            hotels = hotels.filter(pl.col("hotel_id") == hotel_filter)
+
+        if len(hotels) == 0:
+            return _empty_gaps_frame()
+
+        active = ~exclusion_mask(exclusions, self.start_date, self.n_days)
+        n_partitions = min(workers, len(hotels) // GAP_PARTITION_MIN_HOTELS)
+
+        if n_partitions <= 1:
+            gaps = [self._partition_gaps(hotels, active, required_boards, required_occupancies)]
+        else:
+            partitions = hotels.with_columns(
+                (pl.col("hotel_id").hash() % n_partitions).alias("partition")
+            ).partition_by("partition", include_key=False, maintain_order=True)
+            gaps = list(get_gap_pool().map(
+                lambda partition: self._partition_gaps(
+                    partition, active, required_boards, required_occupancies
+                ),
+                partitions,
+            ))
+
+        gaps = [df for df in gaps if len(df) > 0]
+        if not gaps:
+            return _empty_gaps_frame()
+        return pl.concat(gaps).sort(GAP_REPORT_ORDER)
+
+    def _partition_gaps(
+        self,
+        hotels: pl.DataFrame,
+        active: np.ndarray,
+        required_boards: list,
+        required_occupancies: list,
+    ) -> pl.DataFrame:
+        """Unsorted gap rows for a subset of self.hotels; active marks the non-excluded days."""
+        rows = hotels["row"].to_numpy()
+        hotel_days = self.hotel_days[rows]
+        covered = hotel_days & active
+
+        # One bool matrix per requirement; True marks a gap day
+        labels = [("date", "No availability")]
+        masks = [~hotel_days & active]
+
+        for board_name in required_boards:
+            equivalent_boards = BOARD_EQUIVALENTS.get(board_name, [board_name])
+            positions = [i for i, board in enumerate(self.boards) if board in equivalent_boards]
+            have = self.board_days[rows][:, positions, :].any(axis=1)
+            labels.append(("board", f"Missing: {board_name}"))
+            masks.append(covered & ~have)
+
+        for cap_name, cap_value in REQUIRED_OCCUPANCIES.items():
+            if cap_name not in required_occupancies:
+                continue
+            if cap_value in self.capacities:
+                have = self.capacity_days[rows, self.capacities.index(cap_value), :]
+            else:
+                have = np.zeros_like(covered)
+            labels.append(("occupancy", f"Missing: {cap_name} ({cap_value})"))
+            masks.append(covered & ~have)
+
+        # Series are ordered hotel-major, then requirement
+        n_labels = len(labels)
+        series, first, last = _bitmap_runs(
+            np.stack(masks, axis=1).reshape(len(rows) * n_labels, self.n_days)
         )
 
-        # Find dates without this board (only where hotel has coverage)
-        gap_dates = []
-        current = start_date
-        while current <= end_date:
-            if not is_date_excluded(current, exclusions):
-                if current in hotel_dates_set and current not in board_dates:
-                    gap_dates.append(current)
-            current += timedelta(days=1)
-
-        periods = group_consecutive_dates(gap_dates)
-
-        for p in periods:
-            all_gaps.append({
-                "hotel_id": hotel_id,
-                "organization_id": organization_id,
-                "hotel_name": hotel_name,
-                "city": city,
-                "star_rating": star_rating,
-                "supplier_name": supplier_names,
-                "gap_type": "board",
-                "detail": f"Missing: {board_name}",
-                "gap_start": p["gap_start"],
-                "gap_end": p["gap_end"],
-                "duration_days": p["duration_days"],
-            })
-
-    return all_gaps
-
-
-def find_hotel_occupancy_gaps(
-    daily_df: pl.DataFrame,
-    hotel_id: str,
-    organization_id: str,
-    hotel_name: str,
-    city: str,
-    star_rating: int,
-    suppliers: list,
-    required_capacities: list,
-    start_date: date,
-    end_date: date,
-    exclusions: list,
-) -> list:
-    """Find periods missing required occupancies."""
-    hotel_data = daily_df.filter(pl.col("hotel_id") == hotel_id)
-    hotel_dates_set = set(hotel_data["date"].to_list())
-    supplier_names = ", ".join(sorted(suppliers))
+        if len(series) == 0:
+            return _empty_gaps_frame()
+
+        start = date_ordinals([self.start_date])[0]
+        periods = periods_frame(series, first + start, last + start).with_columns([
+            pl.Series("row", rows[series // n_labels]),
+            pl.Series("label", series % n_labels),
+        ])
+        label_df = pl.DataFrame(
+            {
+                "label": list(range(n_labels)),
+                "gap_type": [gap_type for gap_type, _ in labels],
+                "detail": [detail for _, detail in labels],
+            },
+            schema_overrides={"label": periods.schema["label"]},
+        )
 
-    all_gaps = []
+        return periods.join(hotels, on="row").join(label_df, on="label").select([
+            "hotel_id",
+            "organization_id",
+            "hotel_name",
+            "city",
+            "star_rating",
+            "supplier_name",
+            "gap_type",
+            "detail",
+            "gap_start",
+            "gap_end",
+            "duration_days",
+        ])
 
-    for cap_name, cap_value in REQUIRED_OCCUPANCIES.items():
-        if cap_name not in required_capacities:
-            continue
 
-        # Get dates that have this capacity
-        cap_dates = set(
-            hotel_data.filter(pl.col("capacity") == cap_value)["date"].to_list()
-        )
+def count_spans(n_rows: int, n_days: int, rows: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Count matrix of spans covering each day: span i adds 1 to rows[i] from first[i] to last[i] (inclusive)."""
+    diff = np.zeros((n_rows, n_days + 1), dtype=np.int32)
+    np.add.at(diff, (rows, first), 1)
+    np.add.at(diff, (rows, last + 1), -1)
+    return np.cumsum(diff[:, :-1], axis=1)
+
+
+def _paint_spans(n_rows: int, n_days: int, rows: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """Bool matrix with rows[i] set from first[i] to last[i] (inclusive), via difference arrays."""
+    return count_spans(n_rows, n_days, rows, first, last) > 0
+
 
-        # Find dates without this capacity (only where hotel has coverage)
-        gap_dates = []
-        current = start_date
-        while current <= end_date:
-            if not is_date_excluded(current, exclusions):
-                if current in hotel_dates_set and current not in cap_dates:
-                    gap_dates.append(current)
-            current += timedelta(days=1)
-
-        periods = group_consecutive_dates(gap_dates)
-
-        for p in periods:
-            all_gaps.append({
-                "hotel_id": hotel_id,
-                "organization_id": organization_id,
-                "hotel_name": hotel_name,
-                "city": city,
-                "star_rating": star_rating,
-                "supplier_name": supplier_names,
-                "gap_type": "occupancy",
-                "detail": f"Missing: {cap_name} ({cap_value})",
-                "gap_start": p["gap_start"],
-                "gap_end": p["gap_end"],
-                "duration_days": p["duration_days"],
-            })
-
-    return all_gaps
+def _bitmap_runs(matrix: np.ndarray) -> tuple:
+    """Run-length extract True runs per row: returns (row, first_offset, last_offset) arrays."""
+    padded = np.zeros((matrix.shape[0], matrix.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = matrix
+    edges = np.diff(padded, axis=1)
+    series, first = np.nonzero(edges == 1)
+    _, end = np.nonzero(edges == -1)
+    return series, first, end - 1
 
 
 def generate_all_hotel_gaps(
@@ -313,70 +488,72 @@ def generate_all_hotel_gaps(
     required_occupancies: list,
     hotel_filter: Optional[str] = None,
     city_filter: Optional[str] = None,
+    workers: int = GAP_WORKERS,
 ) -> pl.DataFrame:
-    """Generate comprehensive gap report for all hotels."""
-    # Get unique hotels and aggregate all their suppliers into a list
-    hotels = daily_df.group_by(["hotel_id", "organization_id", "hotel_name", "city", "star_rating"]).agg([
-        pl.col("supplier_name").unique().alias("suppliers")
-    ])
+    """
+    Generate comprehensive gap report for all hotels.
 
-    # Apply city filter
-    if city_filter and city_filter != "All":
-        hotels = hotels.filter(pl.col("city") == city_filter)
+    Builds a CoverageIndex from daily_df and reads all three gap types off
+    its day bitmaps in one pass, over workers hotel partitions (see
+    CoverageIndex.find_gaps). Callers that rerun with different
+    requirements should build the index once and call find_gaps directly.
+    """
+    if len(daily_df) == 0:
+        return _empty_gaps_frame()
 
-    # Apply hotel filter
-    if hotel_filter:
-        hotels = hotels.filter(pl.col("hotel_id") == hotel_filter)
+    index = CoverageIndex.from_daily(daily_df, start_date, end_date)
+    return index.find_gaps(
+        exclusions,
+        required_boards,
+        required_occupancies,
+        hotel_filter=hotel_filter,
+        city_filter=city_filter,
+        workers=workers,
+    )
 
-    all_gaps = []
 
-    for row in hotels.iter_rows(named=True):
-        hotel_id = row["hotel_id"]
-        organization_id = row["organization_id"]
-        hotel_name = row["hotel_name"]
-        city = row["city"]
-        star_rating = row["star_rating"]
-        suppliers = row["suppliers"]
+def gaps_fingerprint(gaps_df: pl.DataFrame) -> str:
+    """
+    Content hash of a gap report, used as a cache key for derived outputs.
+
+    Row hashes are only stable within one process, which is all the
+    in-memory caches need.
+    """
+    digest = hashlib.md5(str(len(gaps_df)).encode())
+    if len(gaps_df) > 0:
+        digest.update(gaps_df.hash_rows().to_numpy().tobytes())
+    return digest.hexdigest()
 
-        # Date gaps
-        date_gaps = find_hotel_date_gaps(
-            daily_df, hotel_id, organization_id, hotel_name, city, star_rating, suppliers,
-            start_date, end_date, exclusions
-        )
-        all_gaps.extend(date_gaps)
-
-        # Board gaps
-        if required_boards:
-            board_gaps = find_hotel_board_gaps(
-                daily_df, hotel_id, organization_id, hotel_name, city, star_rating, suppliers,
-                required_boards, start_date, end_date, exclusions
-            )
-            all_gaps.extend(board_gaps)
-
-        # Occupancy gaps
-        if required_occupancies:
-            occ_gaps = find_hotel_occupancy_gaps(
-                daily_df, hotel_id, organization_id, hotel_name, city, star_rating, suppliers,
-                required_occupancies, start_date, end_date, exclusions
-            )
-            all_gaps.extend(occ_gaps)
-
-    if not all_gaps:
-        return pl.DataFrame({
-            "hotel_id": [],
-            "organization_id": [],
-            "hotel_name": [],
-            "city": [],
-            "star_rating": [],
-            "supplier_name": [],
-            "gap_type": [],
-            "detail": [],
-            "gap_start": [],
-            "gap_end": [],
-            "duration_days": [],
-        })
 
-    return pl.DataFrame(all_gaps).sort(["hotel_name", "gap_type", "gap_start"])
+def gap_report_key(
+    start_date: date,
+    end_date: date,
+    exclusions,
+    required_boards: list,
+    required_occupancies: list,
+    filters: dict,
+    rates_version: Optional[str],
+) -> str:
+    """
+    Canonical fingerprint of a gap report's inputs.
+
+    Requirements are order-insensitive, exclusions are compared as their
+    merged intervals (reasons and overlaps don't matter), and filters whose
+    value is None or "All" are dropped, so equivalent requests share a key.
+    rates_version identifies the rates the report is computed from.
+    """
+    canonical = {
+        "window": [start_date.isoformat(), end_date.isoformat()],
+        "exclusions": [
+            [start.isoformat(), end.isoformat()]
+            for start, end in ExclusionSet.coerce(exclusions).intervals
+        ],
+        "boards": sorted(required_boards),
+        "occupancies": sorted(required_occupancies),
+        "filters": {k: v for k, v in filters.items() if v is not None and v != "All"},
+        "rates": rates_version,
+    }
+    return hashlib.md5(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
 
 
 def get_supplier_summary(gaps_df: pl.DataFrame) -> pl.DataFrame:
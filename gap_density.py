@@ -0,0 +1,158 @@
+"""
+Gap density aggregates for the Visualizations tab.
+"""
+
+import numpy as np
+import polars as pl
+
+from gap_analyzer import count_spans
+
+
+class GapDensity:
+    """
+    Per-day, per-month and per-hotel-month gap counts for a gap report.
+
+    Everything is computed from the gap endpoints, never by expanding gaps
+    into days: daily counts come from difference arrays over day ordinals,
+    and hotel-month gap days from clipping each gap to the months it spans.
+    """
+
+    def __init__(
+        self,
+        daily: pl.DataFrame,
+        daily_by_type: pl.DataFrame,
+        monthly: pl.DataFrame,
+        hotel_month: pl.DataFrame,
+    ):
+        self.daily = daily
+        self.daily_by_type = daily_by_type
+        self.monthly = monthly
+        self.hotel_month = hotel_month
+
+    @classmethod
+    def from_gaps(cls, gaps_df: pl.DataFrame) -> "GapDensity":
+        """
+        Build the aggregates for a gap report.
+
+        Frames:
+            daily: date, gap_count, hotels_affected (days with at least one gap)
+            daily_by_type: date, gap_type, count
+            monthly: month ("YYYY-MM"), gap_count (gap days), hotels_affected (daily max)
+            hotel_month: hotel_name, month, gap_days
+        """
+        if len(gaps_df) == 0:
+            return cls(
+                pl.DataFrame(schema={"date": pl.Date, "gap_count": pl.Int64, "hotels_affected": pl.Int64}),
+                pl.DataFrame(schema={"date": pl.Date, "gap_type": pl.String, "count": pl.Int64}),
+                pl.DataFrame(schema={"month": pl.String, "gap_count": pl.Int64, "hotels_affected": pl.Int64}),
+                pl.DataFrame(schema={"hotel_name": pl.String, "month": pl.String, "gap_days": pl.Int64}),
+            )
+
+        first = gaps_df["gap_start"].cast(pl.Int32).to_numpy()
+        last = gaps_df["gap_end"].cast(pl.Int32).to_numpy()
+        origin = int(first.min())
+        n_days = int(last.max()) - origin + 1
+
+        # Open gaps per gap type and day
+        gap_types, type_rows = np.unique(gaps_df["gap_type"].cast(pl.String).to_numpy(), return_inverse=True)
+        by_type = count_spans(len(gap_types), n_days, type_rows, first - origin, last - origin)
+
+        # Hotels with a gap per day: union each hotel's gaps first so overlaps count once
+        hotel_spans = _merge_hotel_spans(gaps_df)
+        hotel_first = hotel_spans["first"].to_numpy() - origin
+        hotel_last = hotel_spans["last"].to_numpy() - origin
+        hotels = count_spans(1, n_days, np.zeros(len(hotel_spans), dtype=np.int64), hotel_first, hotel_last)[0]
+
+        days = pl.Series("date", np.arange(origin, origin + n_days, dtype=np.int32)).cast(pl.Date)
+        daily = pl.DataFrame({
+            "date": days,
+            "gap_count": by_type.sum(axis=0).astype(np.int64),
+            "hotels_affected": hotels.astype(np.int64),
+        }).filter(pl.col("gap_count") > 0)
+
+        type_idx, day_idx = np.nonzero(by_type)
+        daily_by_type = pl.DataFrame({
+            "date": days.gather(day_idx),
+            "gap_type": gap_types[type_idx].tolist(),
+            "count": by_type[type_idx, day_idx].astype(np.int64),
+        }, schema={"date": pl.Date, "gap_type": pl.String, "count": pl.Int64}).sort(["date", "gap_type"])
+
+        monthly = daily.group_by(pl.col("date").dt.strftime("%Y-%m").alias("month")).agg([
+            pl.col("gap_count").sum(),
+            pl.col("hotels_affected").max(),
+        ]).sort("month")
+
+        hotel_month = (
+            gaps_df.lazy()
+            .select([
+                pl.col("hotel_name").cast(pl.String),
+                "gap_start",
+                "gap_end",
+                pl.date_ranges(pl.col("gap_start").dt.month_start(), "gap_end", interval="1mo").alias("month_start"),
+            ])
+            .explode("month_start")
+            .select([
+                "hotel_name",
+                pl.col("month_start").dt.strftime("%Y-%m").alias("month"),
+                (
+                    (
+                        pl.min_horizontal("gap_end", pl.col("month_start").dt.month_end())
+                        - pl.max_horizontal("gap_start", "month_start")
+                    ).dt.total_days() + 1
+                ).alias("gap_days"),
+            ])
+            .group_by(["hotel_name", "month"])
+            .agg(pl.col("gap_days").sum().cast(pl.Int64))
+            .sort(["hotel_name", "month"])
+            .collect()
+        )
+
+        return cls(daily, daily_by_type, monthly, hotel_month)
+
+    def hotel_month_matrix(self, top_n: int = 20) -> tuple:
+        """
+        Gap days matrix for the top_n hotels by total gap days.
+
+        Returns:
+            (hotel_names, months, z) with z[i, j] the gap days of hotel i in month j
+        """
+        months = self.hotel_month["month"].unique().sort().to_list()
+        top_hotels = (
+            self.hotel_month.group_by("hotel_name")
+            .agg(pl.col("gap_days").sum().alias("total_days"))
+            .sort(["total_days", "hotel_name"], descending=[True, False])
+            .head(top_n)["hotel_name"]
+            .to_list()
+        )
+
+        cells = self.hotel_month.filter(pl.col("hotel_name").is_in(top_hotels))
+        hotel_pos = {name: i for i, name in enumerate(top_hotels)}
+        month_pos = {month: j for j, month in enumerate(months)}
+        z = np.zeros((len(top_hotels), len(months)), dtype=np.int64)
+        z[
+            [hotel_pos[name] for name in cells["hotel_name"]],
+            [month_pos[month] for month in cells["month"]],
+        ] = cells["gap_days"].to_numpy()
+        return top_hotels, months, z
+
+
+def _merge_hotel_spans(gaps_df: pl.DataFrame) -> pl.DataFrame:
+    """Union of each hotel's gaps as (first, last) day ordinals, one row per disjoint span."""
+    return (
+        gaps_df.lazy()
+        .select([
+            "hotel_id",
+            pl.col("gap_start").cast(pl.Int32).alias("first"),
+            pl.col("gap_end").cast(pl.Int32).alias("last"),
+        ])
+        .sort(["hotel_id", "first"])
+        .with_columns(
+            (pl.col("first") > pl.col("last").cum_max().shift(1).over("hotel_id"))
+            .fill_null(True)
+            .cum_sum()
+            .alias("span")
+        )
+        .group_by("span")
+        .agg([pl.col("first").min(), pl.col("last").max()])
+        .collect()
+    )
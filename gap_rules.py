@@ -0,0 +1,161 @@
+"""
+Gap requirements and exclusion periods, shared by the gap engines and the database layer.
+
+Standard library only at import time, so db.py and gap_analyzer.py can both
+import it; ExclusionSet.subtract_from_gaps imports Polars when it is called.
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+
+# Board equivalence mapping - having any of these satisfies the requirement
+BOARD_EQUIVALENTS = {
+    "Room Only": ["Room Only"],
+    "Breakfast": ["Breakfast Included", "Sohour Included"],
+    "Lunch": ["Lunch Included", "Iftar Included"],
+    "Dinner": ["Dinner Included", "Iftar Included"],
+    "Half Board": ["Half Board"],
+    "Full Board": ["Full Board"],
+}
+
+# Required occupancies (capacity)
+REQUIRED_OCCUPANCIES = {
+    "Double": 2,
+    "Triple": 3,
+    "Quad": 4,
+}
+
+# Occupancy codes for rate creation (maps display name to DB code)
+OCCUPANCY_CODES = {
+    "Double": "DBL",
+    "Triple": "TRP",
+    "Quad": "QAD",
+}
+
+# Board name to meal type code mapping for rate creation
+BOARD_TO_MEAL_CODE = {
+    "Room Only": "ROOM_ONLY",
+    "Breakfast": "BREAKFAST_INCLUDED",
+    "Lunch": "LUNCH_INCLUDED",
+    "Dinner": "DINNER_INCLUDED",
+    "Half Board": "HALF_BOARD",
+    "Full Board": "FULL_BOARD",
+}
+
+
+def merge_intervals(intervals: list) -> list:
+    """Merge overlapping or adjacent (start, end) date intervals into sorted, disjoint ones."""
+    if not intervals:
+        return []
+
+    intervals = sorted(intervals)
+    merged = [intervals[0]]
+
+    for start, end in intervals[1:]:
+        last_start, last_end = merged[-1]
+        if (start - last_end).days <= 1:
+            if end > last_end:
+                merged[-1] = (last_start, end)
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def subtract_intervals(base: list, remove: list) -> list:
+    """
+    Subtract merged intervals from merged base intervals.
+
+    Both inputs must be sorted and disjoint (see merge_intervals). The result
+    is sorted and disjoint, with no two pieces adjacent to each other.
+    """
+    result = []
+    i = 0
+
+    for start, end in base:
+        # Skip removals that end before this base interval
+        while i < len(remove) and remove[i][1] < start:
+            i += 1
+
+        current = start
+        j = i
+        while j < len(remove) and remove[j][0] <= end:
+            if remove[j][0] > current:
+                result.append((current, remove[j][0] - timedelta(days=1)))
+            current = max(current, remove[j][1] + timedelta(days=1))
+            j += 1
+
+        if current <= end:
+            result.append((current, end))
+
+    return result
+
+
+class ExclusionSet:
+    """
+    Exclusion periods normalized once into merged, sorted (start, end) intervals.
+
+    Built from the dashboard's exclusion dicts ({"start", "end", "reason"}) and
+    shared by the gap engines: CoverageIndex masks its day_ranges, the
+    server-side engine (db.get_gap_intervals) sends the intervals, and
+    subtract_from_gaps clips an existing gap report.
+    """
+
+    def __init__(self, exclusions: Optional[list] = None):
+        self.intervals = merge_intervals([(excl["start"], excl["end"]) for excl in exclusions or []])
+
+    @classmethod
+    def coerce(cls, exclusions) -> "ExclusionSet":
+        """Return exclusions as an ExclusionSet, normalizing a list of dicts if needed."""
+        if isinstance(exclusions, cls):
+            return exclusions
+        return cls(exclusions)
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def day_ranges(self, start_date: date, n_days: int) -> list:
+        """Excluded (first, last) day offsets from start_date, clipped to n_days (inclusive)."""
+        ranges = []
+        for start, end in self.intervals:
+            first = max((start - start_date).days, 0)
+            last = min((end - start_date).days, n_days - 1)
+            if first <= last:
+                ranges.append((first, last))
+        return ranges
+
+    def subtract(self, periods: list) -> list:
+        """Subtract exclusions from (start, end) periods, returning merged intervals."""
+        return subtract_intervals(merge_intervals(periods), self.intervals)
+
+    def subtract_from_gaps(self, gaps_df):
+        """
+        Remove excluded days from a gap report (Polars DataFrame).
+
+        Gap rows overlapping an exclusion are clipped or split, and
+        duration_days is recomputed. Rows keep their original order.
+        """
+        import polars as pl
+
+        if not self.intervals or len(gaps_df) == 0:
+            return gaps_df
+
+        # Allowed days over the report's span, as a small interval frame
+        allowed = self.subtract([(gaps_df["gap_start"].min(), gaps_df["gap_end"].max())])
+        allowed_df = pl.DataFrame(
+            {
+                "allowed_start": [start for start, _ in allowed],
+                "allowed_end": [end for _, end in allowed],
+            },
+            schema={"allowed_start": pl.Date, "allowed_end": pl.Date},
+        )
+
+        return gaps_df.join(allowed_df, how="cross").filter(
+            (pl.col("allowed_end") >= pl.col("gap_start")) & (pl.col("allowed_start") <= pl.col("gap_end"))
+        ).with_columns([
+            pl.max_horizontal(pl.col("gap_start"), pl.col("allowed_start")).alias("gap_start"),
+            pl.min_horizontal(pl.col("gap_end"), pl.col("allowed_end")).alias("gap_end"),
+        ]).with_columns(
+            ((pl.col("gap_end") - pl.col("gap_start")).dt.total_days() + 1).alias("duration_days")
+        ).drop(["allowed_start", "allowed_end"])
@@ -0,0 +1,117 @@
+"""
+Precomputed gap reports for the standard requirement presets.
+"""
+
+import hashlib
+import json
+from datetime import date, timedelta
+from typing import Optional
+
+import polars as pl
+
+from gap_analyzer import CoverageIndex
+from snapshot import SnapshotStore
+
+# Requirement presets materialized by worker.py, by name
+GAP_PRESETS = {
+    "default": {
+        "required_boards": ["Room Only", "Breakfast"],
+        "required_occupancies": ["Double", "Triple", "Quad"],
+    },
+    "room_only": {
+        "required_boards": ["Room Only"],
+        "required_occupancies": ["Double", "Triple", "Quad"],
+    },
+    "all_boards": {
+        "required_boards": ["Room Only", "Breakfast", "Lunch", "Dinner", "Half Board", "Full Board"],
+        "required_occupancies": ["Double", "Triple", "Quad"],
+    },
+}
+
+# Presets cover the dashboard's default analysis period: today -> today + 365 days
+GAP_PRESET_DAYS = 365
+
+
+def preset_window(today: date = None) -> tuple:
+    """(start_date, end_date) of the preset analysis period starting today."""
+    today = today or date.today()
+    return today, today + timedelta(days=GAP_PRESET_DAYS)
+
+
+def find_gap_preset(required_boards: list, required_occupancies: list) -> Optional[str]:
+    """Name of the preset with exactly these requirements (in any order), or None."""
+    for name, preset in GAP_PRESETS.items():
+        if (
+            set(preset["required_boards"]) == set(required_boards)
+            and set(preset["required_occupancies"]) == set(required_occupancies)
+        ):
+            return name
+    return None
+
+
+def compute_preset_gaps(rates_df: pl.DataFrame, start_date: date, end_date: date) -> dict:
+    """
+    Gap reports for every preset over one window, without exclusions or filters.
+
+    Rates are restricted to the window the same way the dashboard does it,
+    so the reports match an unfiltered "Generate Gap Report". The coverage
+    index is built once and shared by all presets.
+
+    Returns:
+        preset name -> gap report DataFrame
+    """
+    window_df = rates_df.filter(
+        (pl.col("end_date") >= start_date) & (pl.col("start_date") <= end_date)
+    )
+    index = CoverageIndex.from_rates(window_df, start_date, end_date)
+    return {
+        name: index.find_gaps([], preset["required_boards"], preset["required_occupancies"])
+        for name, preset in GAP_PRESETS.items()
+    }
+
+
+class GapStore:
+    """
+    Gap reports per preset, persisted as snapshots named gaps-{preset}.
+
+    A report is stamped with the rates version it was computed from and its
+    window, and is only served for exactly that version and window. Anything
+    else (older rates, another day) reads as a miss and the caller computes
+    on demand.
+    """
+
+    def __init__(self, snapshots: SnapshotStore = None):
+        self.snapshots = snapshots or SnapshotStore()
+
+    def get(self, preset: str, rates_version: str, start_date: date, end_date: date) -> Optional[tuple]:
+        """
+        Stored report for preset, if it matches the rates version and window.
+
+        Returns:
+            (gaps_df, saved_at) or None
+        """
+        if rates_version is None:
+            return None
+        snapshot = self.snapshots.load(f"gaps-{preset}")
+        if snapshot is None:
+            return None
+        frame, meta = snapshot
+        if meta["version"] != self.report_version(preset, rates_version, start_date, end_date):
+            return None
+        return frame, meta["saved_at"]
+
+    def put(self, preset: str, gaps_df: pl.DataFrame, rates_version: str, start_date: date, end_date: date):
+        """Store the report for preset, replacing the previous one."""
+        self.snapshots.save(
+            f"gaps-{preset}",
+            gaps_df,
+            self.report_version(preset, rates_version, start_date, end_date),
+        )
+
+    @staticmethod
+    def report_version(preset: str, rates_version: str, start_date: date, end_date: date) -> str:
+        """Version of a preset report: its requirements, window and the rates it was computed from."""
+        return hashlib.md5(json.dumps(
+            [GAP_PRESETS[preset], rates_version, start_date.isoformat(), end_date.isoformat()],
+            sort_keys=True,
+        ).encode()).hexdigest()
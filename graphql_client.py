@@ -1,10 +1,22 @@
 """
 GraphQL client for Hasura mutations - hotel rate creation.
+
+Requests run on one asyncio event loop in a background thread, over a
+pooled keep-alive httpx.AsyncClient. The module-level functions are sync
+wrappers that submit to that loop and wait for the result.
 """
 
+import asyncio
+import json
 import os
-import requests
+import random
+import re
+import threading
+import time
+from collections import deque
 from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,16 +24,272 @@ load_dotenv()
 HASURA_URL = os.getenv("HASURA_GRAPHQL_URL")
 HASURA_ADMIN_SECRET = os.getenv("HASURA_ADMIN_SECRET")
 
+# Bulk inserts: rows per insert_hotel_rates mutation and concurrent mutations
+HASURA_BATCH_SIZE = int(os.getenv("HASURA_BATCH_SIZE", "50"))
+HASURA_MAX_WORKERS = int(os.getenv("HASURA_MAX_WORKERS", "4"))
+
+# Per-request timeout and retries of transient failures (queries: timeouts, connection
+# errors, 429, 5xx; mutations: only failures to connect, see HasuraClient)
+HASURA_TIMEOUT = float(os.getenv("HASURA_TIMEOUT", "30"))
+HASURA_MAX_RETRIES = int(os.getenv("HASURA_MAX_RETRIES", "3"))
+HASURA_BACKOFF_BASE = 0.5
+HASURA_BACKOFF_MAX = 8.0
+
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+INSERT_HOTEL_RATE_MUTATION = """
+mutation InsertHotelRate($object: hotel_rates_insert_input!) {
+    insert_hotel_rates_one(object: $object) {
+        id
+        status
+        start_date
+        end_date
+        hotel_id
+        supplier_id
+        hotel_rate_meal_supplements {
+            id
+            meal_type_code
+            supplement_price
+        }
+    }
+}
+"""
+
+INSERT_HOTEL_RATES_MUTATION = """
+mutation InsertHotelRates($objects: [hotel_rates_insert_input!]!) {
+    insert_hotel_rates(objects: $objects) {
+        returning {
+            id
+            hotel_rate_meal_supplements {
+                id
+                meal_type_code
+            }
+        }
+    }
+}
+"""
+
 
-def get_headers() -> dict:
-    """Get headers for Hasura GraphQL requests."""
+def get_headers(admin_secret: Optional[str] = None) -> dict:
+    """Get headers for Hasura GraphQL requests (default secret HASURA_ADMIN_SECRET)."""
     return {
         "Content-Type": "application/json",
-        "x-hasura-admin-secret": HASURA_ADMIN_SECRET,
+        "x-hasura-admin-secret": admin_secret or HASURA_ADMIN_SECRET or "",
     }
 
 
-def insert_hotel_rate(
+class HasuraClient:
+    """
+    Async Hasura GraphQL client with a persistent connection pool.
+
+    - Transient query failures (timeouts, connection errors, HTTP 429 and
+      5xx) are retried up to max_retries times with exponential backoff and
+      full jitter.
+    - Mutations are only retried when the connection could not be opened.
+      A timeout or 5xx may arrive after Hasura committed the insert, and a
+      replay would then fail on the unique index of a row that was created.
+    - Identical queries in flight at the same time share one round trip.
+      Mutations are never merged: each caller's insert is its own request.
+    - Latency, errors, retries and coalesced calls are recorded per operation
+      (see get_metrics).
+
+    The httpx client binds to the event loop it is first used on, so a
+    client must only be used from one loop (see run_sync).
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        admin_secret: Optional[str] = None,
+        max_connections: int = HASURA_MAX_WORKERS,
+        timeout: float = HASURA_TIMEOUT,
+        max_retries: int = HASURA_MAX_RETRIES,
+    ):
+        self.url = url or HASURA_URL
+        self.admin_secret = admin_secret if admin_secret is not None else HASURA_ADMIN_SECRET
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._http = None
+        self._inflight = {}
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    async def execute(
+        self,
+        query: str,
+        variables: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> dict:
+        """
+        Run a GraphQL request.
+
+        Returns:
+            The response body ('data' and/or 'errors'), or an 'errors' dict
+            when the request failed after all retries
+        """
+        payload = {"query": query, "variables": variables or {}}
+        timeout = self.timeout if timeout is None else timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        if _is_mutation(query):
+            return await self._send(payload, timeout, max_retries, mutation=True)
+
+        key = json.dumps(payload, sort_keys=True, default=str)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._send(payload, timeout, max_retries))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._record(_operation_name(query), coalesced=True)
+        # A cancelled caller must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def get_metrics(self) -> dict:
+        """
+        Per-operation counters and latency percentiles over the last 1000 calls.
+
+        Returns:
+            operation name -> calls, errors, retries, coalesced, p50_ms, p95_ms, max_ms
+        """
+        with self._metrics_lock:
+            metrics = {}
+            for operation, m in self._metrics.items():
+                latencies = sorted(m["latencies"])
+                metrics[operation] = {
+                    "calls": m["calls"],
+                    "errors": m["errors"],
+                    "retries": m["retries"],
+                    "coalesced": m["coalesced"],
+                    "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+                    "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+                    "max_ms": latencies[-1] * 1000 if latencies else None,
+                }
+            return metrics
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _send(self, payload: dict, timeout: float, max_retries: int, mutation: bool = False) -> dict:
+        operation = _operation_name(payload["query"])
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            retry_after = None
+            # Whether the server may have processed the request despite the failure
+            unsure = True
+            try:
+                response = await self._get_http().post(
+                    self.url,
+                    json=payload,
+                    headers=get_headers(self.admin_secret),
+                    timeout=timeout,
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Nothing was sent, so even a mutation is safe to replay
+                error, retryable, unsure = f"Request failed: {e!r}", True, False
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                error, retryable = f"Request failed: {e!r}", not mutation
+            except httpx.HTTPError as e:
+                error, retryable = f"Request failed: {e!r}", False
+            else:
+                if response.status_code == 429 or response.status_code >= 500:
+                    error, retryable = f"Request failed: HTTP {response.status_code}", not mutation
+                    retry_after = response.headers.get("Retry-After")
+                elif response.is_error:
+                    error, retryable, unsure = f"Request failed: HTTP {response.status_code}", False, False
+                else:
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        error, retryable = "Request failed: response is not JSON", False
+                    else:
+                        self._record(operation, started=started, retries=attempt, failed="errors" in result)
+                        return result
+
+            if not retryable or attempt >= max_retries:
+                self._record(operation, started=started, retries=attempt, failed=True)
+                if mutation and unsure:
+                    error += " (the change may still have been applied; refresh before retrying)"
+                return {"errors": [{"message": error}]}
+
+            attempt += 1
+            delay = backoff_delay(attempt)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), HASURA_BACKOFF_MAX))
+            await asyncio.sleep(delay)
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(limits=self._limits, timeout=self.timeout)
+        return self._http
+
+    def _record(
+        self,
+        operation: str,
+        started: Optional[float] = None,
+        retries: int = 0,
+        failed: bool = False,
+        coalesced: bool = False,
+    ):
+        with self._metrics_lock:
+            m = self._metrics.setdefault(operation, {
+                "calls": 0, "errors": 0, "retries": 0, "coalesced": 0, "latencies": deque(maxlen=1000),
+            })
+            if coalesced:
+                m["coalesced"] += 1
+                return
+            m["calls"] += 1
+            m["errors"] += failed
+            m["retries"] += retries
+            m["latencies"].append(time.perf_counter() - started)
+
+
+def backoff_delay(attempt: int, base: float = HASURA_BACKOFF_BASE, cap: float = HASURA_BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^(attempt - 1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _is_mutation(query: str) -> bool:
+    return re.match(r"\s*mutation\b", query) is not None
+
+
+def _operation_name(query: str) -> str:
+    match = re.search(r"\b(?:query|mutation)\s+(\w+)", query)
+    return match.group(1) if match else "anonymous"
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the background event loop and wait for its result."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="hasura-client", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result(timeout)
+
+
+def get_client() -> HasuraClient:
+    """Process-wide client for HASURA_GRAPHQL_URL, used on the background loop."""
+    global _client
+    with _loop_lock:
+        if _client is None:
+            _client = HasuraClient()
+        return _client
+
+
+def get_hasura_metrics() -> dict:
+    """Latency and error metrics of the process-wide client (see HasuraClient.get_metrics)."""
+    return get_client().get_metrics()
+
+
+def build_rate_object(
     organization_id: str,
     hotel_id: str,
     room_type_id: str,
@@ -37,9 +305,10 @@ def insert_hotel_rate(
     min_booking_days_in_advance: Optional[int] = None,
     num_of_rooms: Optional[int] = None,
     status: str = "pending_approval",
+    meal_supplements: Optional[list] = None,
 ) -> dict:
     """
-    Insert a new hotel rate via Hasura GraphQL.
+    Build a hotel_rates_insert_input object; optional fields are left out when None.
 
     Args:
         organization_id: UUID of the organization
@@ -57,26 +326,14 @@ def insert_hotel_rate(
         min_booking_days_in_advance: Optional minimum booking days
         num_of_rooms: Optional number of rooms
         status: Rate status (default: pending_approval)
+        meal_supplements: Optional meal upgrades, dicts with 'meal_type_code'
+            and 'supplement_price'. They are inserted as nested
+            hotel_rate_meal_supplements rows in the same mutation, so a rate
+            and its supplements are created together or not at all
 
     Returns:
-        dict with 'data' on success or 'errors' on failure
-    """
-    if not HASURA_URL or not HASURA_ADMIN_SECRET:
-        return {"errors": [{"message": "Hasura configuration missing. Set HASURA_GRAPHQL_URL and HASURA_ADMIN_SECRET in .env"}]}
-
-    mutation = """
-    mutation InsertHotelRate($object: hotel_rates_insert_input!) {
-        insert_hotel_rates_one(object: $object) {
-            id
-            status
-            start_date
-            end_date
-            hotel_id
-            supplier_id
-        }
-    }
+        dict for the 'object' / 'objects' mutation variables
     """
-
     # Build the rate object
     rate_object = {
         "organization_id": organization_id,
@@ -99,20 +356,167 @@ def insert_hotel_rate(
         rate_object["min_booking_days_in_advance"] = min_booking_days_in_advance
     if num_of_rooms is not None:
         rate_object["num_of_rooms"] = num_of_rooms
+    if meal_supplements:
+        rate_object["hotel_rate_meal_supplements"] = {
+            "data": [
+                {
+                    "organization_id": organization_id,
+                    "meal_type_code": supplement["meal_type_code"],
+                    "supplement_price": supplement["supplement_price"],
+                }
+                for supplement in meal_supplements
+            ]
+        }
+
+    return rate_object
+
+
+def insert_hotel_rate(
+    organization_id: str,
+    hotel_id: str,
+    room_type_id: str,
+    supplier_id: str,
+    start_date: str,
+    end_date: str,
+    occupancy: str,
+    weekday_rate: float,
+    weekend_rate: float,
+    currency: str,
+    rate_type: str,
+    included_meal_type_code: str,
+    min_booking_days_in_advance: Optional[int] = None,
+    num_of_rooms: Optional[int] = None,
+    status: str = "pending_approval",
+    meal_supplements: Optional[list] = None,
+) -> dict:
+    """
+    Insert a new hotel rate, with its meal supplements, via Hasura GraphQL.
+
+    Takes the same arguments as build_rate_object. The rate and its
+    supplements are one mutation, i.e. one round trip and one transaction.
+
+    Returns:
+        dict with 'data' on success or 'errors' on failure
+    """
+    if not HASURA_URL or not HASURA_ADMIN_SECRET:
+        return {"errors": [{"message": "Hasura configuration missing. Set HASURA_GRAPHQL_URL and HASURA_ADMIN_SECRET in .env"}]}
+
+    rate_object = build_rate_object(
+        organization_id=organization_id,
+        hotel_id=hotel_id,
+        room_type_id=room_type_id,
+        supplier_id=supplier_id,
+        start_date=start_date,
+        end_date=end_date,
+        occupancy=occupancy,
+        weekday_rate=weekday_rate,
+        weekend_rate=weekend_rate,
+        currency=currency,
+        rate_type=rate_type,
+        included_meal_type_code=included_meal_type_code,
+        min_booking_days_in_advance=min_booking_days_in_advance,
+        num_of_rooms=num_of_rooms,
+        status=status,
+        meal_supplements=meal_supplements,
+    )
+    return run_sync(get_client().execute(INSERT_HOTEL_RATE_MUTATION, {"object": rate_object}))
+
+
+def insert_hotel_rates(
+    rates: list,
+    batch_size: int = HASURA_BATCH_SIZE,
+    max_workers: int = HASURA_MAX_WORKERS,
+    client: Optional[HasuraClient] = None,
+) -> list:
+    """
+    Insert many hotel rates with batched insert_hotel_rates mutations.
+
+    Rows are split into batches of batch_size, and up to max_workers batches
+    are in flight at once on the background loop. A mutation is atomic, so
+    a batch that hits a constraint violation is retried row by row to find
+    out which rows conflict; the rest of that batch is still created. Rows
+    may carry meal_supplements, which are inserted nested with their rate,
+    so a rate never ends up with only some of its supplements.
+
+    Args:
+        rates: Rows of build_rate_object keyword arguments
+        batch_size: Rows per mutation
+        max_workers: Concurrent mutations
+        client: Client to send with (default the process-wide one), e.g. one for a mock server
+
+    Returns:
+        One dict per input row, in input order, with 'status' ('created',
+        'conflict' or 'error'), 'id' of the created rate, 'supplement_ids'
+        of its created meal supplements and 'error' message
+    """
+    if client is None and (not HASURA_URL or not HASURA_ADMIN_SECRET):
+        return [_row_result("error", error="Hasura configuration missing") for _ in rates]
+
+    return run_sync(insert_hotel_rates_async(rates, batch_size, max_workers, client or get_client()))
 
-    variables = {"object": rate_object}
 
-    try:
-        response = requests.post(
-            HASURA_URL,
-            json={"query": mutation, "variables": variables},
-            headers=get_headers(),
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"errors": [{"message": f"Request failed: {str(e)}"}]}
+async def insert_hotel_rates_async(
+    rates: list,
+    batch_size: int,
+    max_workers: int,
+    client: HasuraClient,
+) -> list:
+    """Coroutine behind insert_hotel_rates, for callers already on an event loop."""
+    objects = [build_rate_object(**rate) for rate in rates]
+    batches = [objects[i:i + batch_size] for i in range(0, len(objects), batch_size)]
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def insert_batch(batch: list) -> list:
+        async with semaphore:
+            result = await client.execute(INSERT_HOTEL_RATES_MUTATION, {"objects": batch})
+            if "errors" not in result:
+                returning = result["data"]["insert_hotel_rates"]["returning"]
+                return [_created_result(row) for row in returning]
+            if not any(_is_constraint_violation(e) for e in result["errors"]):
+                message = result["errors"][0].get("message", "Unknown error")
+                return [_row_result("error", error=message) for _ in batch]
+
+            # Find the offending rows one by one
+            rows = []
+            for obj in batch:
+                row = await client.execute(INSERT_HOTEL_RATE_MUTATION, {"object": obj})
+                if "errors" not in row:
+                    rows.append(_created_result(row["data"]["insert_hotel_rates_one"]))
+                else:
+                    error = row["errors"][0]
+                    status = "conflict" if _is_unique_violation(error) else "error"
+                    rows.append(_row_result(status, error=error.get("message", "Unknown error")))
+            return rows
+
+    results = await asyncio.gather(*(insert_batch(batch) for batch in batches))
+    return [row for rows in results for row in rows]
+
+
+def _row_result(
+    status: str,
+    rate_id: Optional[str] = None,
+    supplement_ids: Optional[list] = None,
+    error: Optional[str] = None,
+) -> dict:
+    return {"status": status, "id": rate_id, "supplement_ids": supplement_ids or [], "error": error}
+
+
+def _created_result(rate: dict) -> dict:
+    return _row_result(
+        "created",
+        rate_id=rate["id"],
+        supplement_ids=[supplement["id"] for supplement in rate.get("hotel_rate_meal_supplements") or []],
+    )
+
+
+def _is_constraint_violation(error: dict) -> bool:
+    """Hasura reports unique, foreign key and check violations with code 'constraint-violation'."""
+    return (error.get("extensions") or {}).get("code") == "constraint-violation" or _is_unique_violation(error)
+
+
+def _is_unique_violation(error: dict) -> bool:
+    message = error.get("message", "").lower()
+    return "uniqueness violation" in message or "unique constraint" in message
 
 
 def insert_meal_supplement(
@@ -122,7 +526,10 @@ def insert_meal_supplement(
     supplement_price: float,
 ) -> dict:
     """
-    Insert a meal supplement for a hotel rate.
+    Insert a meal supplement for an existing hotel rate.
+
+    New rates should pass meal_supplements to insert_hotel_rate instead,
+    which creates them in the same mutation as the rate.
 
     Args:
         organization_id: UUID of the organization
@@ -155,17 +562,7 @@ def insert_meal_supplement(
         }
     }
 
-    try:
-        response = requests.post(
-            HASURA_URL,
-            json={"query": mutation, "variables": variables},
-            headers=get_headers(),
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        return {"errors": [{"message": f"Request failed: {str(e)}"}]}
+    return run_sync(get_client().execute(mutation, variables))
 
 
 def test_hasura_connection() -> bool:
@@ -179,15 +576,6 @@ def test_hasura_connection() -> bool:
     }
     """
 
-    try:
-        response = requests.post(
-            HASURA_URL,
-            json={"query": query},
-            headers=get_headers(),
-            timeout=10,
-        )
-        response.raise_for_status()
-        result = response.json()
-        return "data" in result and "errors" not in result
-    except Exception:
-        return False
+    # A probe, not worth retrying; concurrent probes from many sessions share one request
+    result = run_sync(get_client().execute(query, timeout=10, max_retries=0))
+    return "data" in result and "errors" not in result
@@ -0,0 +1,136 @@
+"""
+Background health checks for the database and Hasura.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_TTL = float(os.getenv("HEALTH_TTL", "60"))
+
+# Upper bounds (ms) of the probe latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class HealthMonitor:
+    """
+    Probes each backend on a daemon thread and caches the result.
+
+    The UI reads status() and is_healthy(), which never issue requests.
+    Only start() probes synchronously, once per process, so the first page
+    has a real status. A status older than ttl (e.g. a probe hanging on a
+    dead link) reads as unknown rather than as the last known result.
+    """
+
+    def __init__(
+        self,
+        checks: dict,
+        interval: float = HEALTH_CHECK_INTERVAL,
+        ttl: float = HEALTH_TTL,
+    ):
+        """
+        Args:
+            checks: backend name -> probe returning True when the backend is usable
+            interval: Seconds between probe rounds
+            ttl: Seconds a probe result stays valid
+        """
+        self.checks = checks
+        self.interval = interval
+        self.ttl = ttl
+        self._status = {}
+        self._histograms = {name: [0] * (len(LATENCY_BUCKETS_MS) + 1) for name in checks}
+        self._recent = {name: deque(maxlen=200) for name in checks}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        """Probe every backend once, then keep probing in the background."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self.check_all()
+        self._thread.start()
+
+    def check_all(self):
+        """Probe every backend now."""
+        for name in self.checks:
+            self._check(name)
+
+    def request_check(self):
+        """Ask the monitor thread to probe again without waiting for the interval."""
+        self._wake.set()
+
+    def status(self, name: str) -> dict:
+        """
+        Cached status of a backend.
+
+        Returns:
+            dict with 'ok' (True, False, or None when unknown or older than
+            ttl), 'checked_at', 'latency_ms' and 'error'
+        """
+        with self._lock:
+            status = self._status.get(name)
+        if status is None or time.monotonic() - status["checked"] > self.ttl:
+            return {
+                "ok": None,
+                "checked_at": status["checked_at"] if status else None,
+                "latency_ms": None,
+                "error": "no recent health check",
+            }
+        return {key: value for key, value in status.items() if key != "checked"}
+
+    def is_healthy(self, name: str) -> bool:
+        """Whether the last probe (within ttl) succeeded."""
+        return self.status(name)["ok"] is True
+
+    def get_latency_stats(self) -> dict:
+        """
+        Probe latency per backend.
+
+        Returns:
+            name -> 'buckets' as (upper bound ms or None for the open bucket,
+            count) pairs over all probes, and 'p50_ms', 'p95_ms' over the
+            last 200 probes
+        """
+        with self._lock:
+            stats = {}
+            for name in self.checks:
+                recent = sorted(self._recent[name])
+                stats[name] = {
+                    "buckets": list(zip(LATENCY_BUCKETS_MS + [None], self._histograms[name])),
+                    "p50_ms": recent[len(recent) // 2] if recent else None,
+                    "p95_ms": recent[int(len(recent) * 0.95)] if recent else None,
+                }
+            return stats
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.check_all()
+
+    def _check(self, name: str):
+        started = time.perf_counter()
+        error = None
+        try:
+            ok = bool(self.checks[name]())
+        except Exception as e:
+            ok, error = False, str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._status[name] = {
+                "ok": ok,
+                "checked_at": datetime.now(),
+                "checked": time.monotonic(),
+                "latency_ms": latency_ms,
+                "error": error if error or ok else "check failed",
+            }
+            self._histograms[name][bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            self._recent[name].append(latency_ms)
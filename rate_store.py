@@ -0,0 +1,148 @@
+"""
+Cached rates frame kept in sync with hotel_rates by delta refreshes.
+"""
+
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+import polars as pl
+
+from db import copy_hotel_rates, get_rate_checksums
+from rates_schema import RATES_SCHEMA, read_rates_csv
+from snapshot import SnapshotStore
+
+
+class RateStore:
+    """
+    Process-wide rates frame, refreshed by per hotel/supplier checksums.
+
+    hotel_rates has no change timestamp, so each sync fetches the cheap
+    checksum per (hotel_id, supplier_id) group and only reloads the groups
+    whose checksum changed. Groups that disappeared (all rates deactivated
+    or expired) are dropped from the frame.
+
+    With a SnapshotStore, the frame and checksums are saved after every sync
+    that changed them, and a fresh process starts from the snapshot and
+    delta-syncs it in the background.
+    """
+
+    def __init__(self, snapshots: SnapshotStore = None):
+        self.frame = None
+        self.checksums = {}
+        self.version = None
+        self.last_sync = None
+        self.last_delta = {}
+        self.snapshot_at = None
+        self.snapshots = snapshots
+        self._lock = threading.Lock()
+
+    def load(self) -> pl.DataFrame:
+        """Return the rates frame, restoring the snapshot or doing a full load on first use."""
+        if self.frame is None:
+            with self._lock:
+                restored = self.frame is None and self._restore()
+            if restored:
+                threading.Thread(target=self.sync, name="rate-store-revalidate", daemon=True).start()
+            elif self.frame is None:
+                self.sync()
+        return self.frame
+
+    def current(self) -> tuple:
+        """(frame, version) as of the same sync; (None, None) before the first load."""
+        with self._lock:
+            return self.frame, self.version
+
+    def sync(self) -> dict:
+        """
+        Bring the frame up to date with the database.
+
+        Returns:
+            dict with counts of 'changed' and 'removed' hotel/supplier groups
+            and 'rows_fetched'
+        """
+        with self._lock:
+            current = {
+                (r["hotel_id"], r["supplier_id"]): r["checksum"]
+                for r in get_rate_checksums()
+            }
+
+            if self.frame is None:
+                changed = list(current)
+                removed = []
+                fetched = frame = self._fetch()
+            else:
+                changed = [key for key, checksum in current.items() if self.checksums.get(key) != checksum]
+                removed = [key for key in self.checksums if key not in current]
+                frame = self._drop_groups(self.frame, changed + removed)
+                fetched = self._fetch(pairs=changed) if changed else pl.DataFrame(schema=RATES_SCHEMA)
+                if len(fetched) > 0:
+                    frame = pl.concat([frame, fetched], how="vertical_relaxed")
+                    frame = frame.sort(["hotel_name", "start_date"])
+
+            previous_version = self.version
+            self.frame = frame
+            self.checksums = current
+            self.version = hashlib.md5(
+                "".join(f"{h}{s}{c}" for (h, s), c in sorted(current.items())).encode()
+            ).hexdigest()
+            if self.snapshots is not None and self.version != previous_version:
+                self._save_snapshot()
+            self.last_sync = datetime.now()
+            self.last_delta = {
+                "changed": len(changed),
+                "removed": len(removed),
+                "rows_fetched": len(fetched),
+            }
+            return self.last_delta
+
+    def _restore(self) -> bool:
+        """Load the frame and checksums from the snapshot, if both are present and match."""
+        if self.snapshots is None:
+            return False
+        rates = self.snapshots.load("rates")
+        checksums = self.snapshots.load("rate_checksums")
+        if rates is None or checksums is None or rates[1]["version"] != checksums[1]["version"]:
+            return False
+
+        self.frame = rates[0]
+        self.checksums = {
+            (hotel_id, supplier_id): checksum
+            for hotel_id, supplier_id, checksum in checksums[0].iter_rows()
+        }
+        self.version = rates[1]["version"]
+        self.snapshot_at = rates[1]["saved_at"]
+        return True
+
+    def _save_snapshot(self):
+        checksums = pl.DataFrame(
+            [(h, s, c) for (h, s), c in self.checksums.items()],
+            schema={"hotel_id": pl.String, "supplier_id": pl.String, "checksum": pl.String},
+            orient="row",
+        )
+        self.snapshots.save("rate_checksums", checksums, self.version)
+        self.snapshots.save("rates", self.frame, self.version)
+
+    @staticmethod
+    def _fetch(**filters) -> pl.DataFrame:
+        """Load rates into a frame via COPY, spooling the CSV to a temporary file."""
+        with tempfile.TemporaryFile() as tmp:
+            copy_hotel_rates(tmp, **filters)
+            tmp.seek(0)
+            return read_rates_csv(tmp)
+
+    @staticmethod
+    def _drop_groups(frame: pl.DataFrame, groups: list) -> pl.DataFrame:
+        """Remove all rows of the given (hotel_id, supplier_id) groups."""
+        if not groups or len(frame) == 0:
+            return frame
+
+        stale = pl.DataFrame(
+            {
+                "hotel_id": [hotel_id for hotel_id, _ in groups],
+                "supplier_id": [supplier_id for _, supplier_id in groups],
+            },
+            schema={"hotel_id": frame.schema["hotel_id"], "supplier_id": frame.schema["supplier_id"]},
+        )
+        return frame.join(stale, on=["hotel_id", "supplier_id"], how="anti")
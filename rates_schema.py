@@ -0,0 +1,42 @@
+"""
+The typed rates frame that every rates loader produces.
+"""
+
+import polars as pl
+
+
+# Rates frame columns and types, in db.get_hotel_rates column order.
+# UUIDs stay strings; low-cardinality labels are Categorical.
+RATES_SCHEMA = {
+    "hotel_id": pl.String,
+    "organization_id": pl.String,
+    "hotel_name": pl.String,
+    "city": pl.Categorical,
+    "star_rating": pl.Int8,
+    "room_type_id": pl.String,
+    "room_name": pl.String,
+    "capacity": pl.Int8,
+    "start_date": pl.Date,
+    "end_date": pl.Date,
+    "board": pl.Categorical,
+    "supplier_id": pl.String,
+    "supplier_name": pl.String,
+}
+
+
+def rates_to_dataframe(rates: list) -> pl.DataFrame:
+    """Convert database rates to Polars DataFrame."""
+    if not rates:
+        return pl.DataFrame(schema=RATES_SCHEMA)
+
+    df = pl.DataFrame([dict(r) for r in rates])
+    return df.with_columns([
+        pl.col(col).cast(dtype)
+        for col, dtype in RATES_SCHEMA.items()
+        if col in df.columns and df.schema[col] != pl.Object
+    ])
+
+
+def read_rates_csv(source) -> pl.DataFrame:
+    """Read rates exported as CSV with a header (see db.copy_hotel_rates)."""
+    return pl.read_csv(source, schema=RATES_SCHEMA)
@@ -0,0 +1,141 @@
+"""
+On-disk snapshots of loaded data for fast cold starts.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import polars as pl
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", ".cache/snapshots")
+
+
+def records_version(rows: list) -> str:
+    """Content hash of query rows, stable across processes."""
+    return hashlib.md5(
+        json.dumps([dict(r) for r in rows], sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class SnapshotStore:
+    """
+    Frames persisted as uncompressed Arrow IPC files, stamped with a data version.
+
+    Each snapshot is a data file named after its version plus a small
+    {name}.json pointer that is replaced atomically, so readers in this or
+    another process never see a half-written snapshot. Snapshots are read
+    memory-mapped, so loading one costs almost nothing until it is used.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR):
+        self.directory = Path(directory)
+        self._served = set()
+        self._revalidating = set()
+        self._lock = threading.Lock()
+
+    def load(self, name: str) -> Optional[tuple]:
+        """
+        Read the latest snapshot.
+
+        Returns:
+            (frame, meta) with meta holding 'version', 'saved_at' and 'rows',
+            or None if there is no readable snapshot
+        """
+        meta = self._meta(name)
+        if meta is None:
+            return None
+        try:
+            # Uncompressed IPC files are memory-mapped by read_ipc
+            frame = pl.read_ipc(self.directory / meta["file"])
+        except (OSError, pl.exceptions.PolarsError):
+            return None
+        return frame, meta
+
+    def save(self, name: str, frame: pl.DataFrame, version: str):
+        """Write a snapshot and point {name}.json at it, removing the previous file."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_file = f"{name}-{version[:16]}.arrow"
+        pointer = self.directory / f"{name}.json"
+
+        previous = self._meta(name)
+        tmp = self.directory / f".{data_file}.{os.getpid()}.tmp"
+        frame.write_ipc(tmp, compression="uncompressed")
+        os.replace(tmp, self.directory / data_file)
+
+        meta = {
+            "file": data_file,
+            "version": version,
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "rows": len(frame),
+        }
+        tmp = self.directory / f".{name}.json.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, pointer)
+
+        if previous is not None and previous["file"] != data_file:
+            try:
+                (self.directory / previous["file"]).unlink()
+            except OSError:
+                pass
+
+    def records(self, name: str, fetch: Callable[[], list], on_change: Callable[[], None] = None) -> list:
+        """
+        Rows from fetch(), served from the snapshot on the first call in this process.
+
+        The first call returns the snapshot (if any) immediately and re-runs
+        fetch in a background thread; when the data changed, the snapshot is
+        replaced and on_change is called. Later calls (e.g. after a cache
+        clear) always fetch, and refresh the snapshot.
+        """
+        with self._lock:
+            first_call = name not in self._served
+            self._served.add(name)
+
+        snapshot = self.load(name) if first_call else None
+        if snapshot is None:
+            rows = fetch()
+            self._save_records(name, rows)
+            return rows
+
+        frame, meta = snapshot
+        threading.Thread(
+            target=self._revalidate_records,
+            args=(name, fetch, meta["version"], on_change),
+            name=f"snapshot-revalidate-{name}",
+            daemon=True,
+        ).start()
+        return frame.to_dicts()
+
+    def _revalidate_records(self, name: str, fetch: Callable[[], list], version: str, on_change):
+        with self._lock:
+            if name in self._revalidating:
+                return
+            self._revalidating.add(name)
+
+        try:
+            rows = fetch()
+            if records_version(rows) != version:
+                self._save_records(name, rows)
+                if on_change is not None:
+                    on_change()
+        finally:
+            with self._lock:
+                self._revalidating.discard(name)
+
+    def _save_records(self, name: str, rows: list):
+        version = records_version(rows)
+        current = self._meta(name)
+        if current is None or current["version"] != version:
+            self.save(name, pl.DataFrame([dict(r) for r in rows]), version)
+
+    def _meta(self, name: str) -> Optional[dict]:
+        try:
+            meta = json.loads((self.directory / f"{name}.json").read_text())
+        except (OSError, ValueError):
+            return None
+        return meta if isinstance(meta, dict) and "file" in meta and "version" in meta else None
@@ -0,0 +1,138 @@
+"""
+In-process mock of the Hasura endpoints used by graphql_client.
+
+Handles the insert_hotel_rates / insert_hotel_rates_one mutations with a
+unique index on (hotel_id, room_type_id, supplier_id, start_date, end_date,
+occupancy) and a check constraint on weekday_rate >= 0, like the real
+table. Any other operation is answered as a query. Requests are recorded,
+responses can be delayed and the next responses can be failed with an HTTP
+status.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UNIQUE_KEY = ("hotel_id", "room_type_id", "supplier_id", "start_date", "end_date", "occupancy")
+
+
+class MockHasura:
+    """Threaded HTTP server on 127.0.0.1; use as a context manager or call start()/stop()."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.requests = []
+        self.rates = {}
+        self.concurrent = 0
+        self.peak_concurrent = 0
+        self._fail_statuses = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1/graphql"
+
+    def start(self) -> "MockHasura":
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, response = mock._handle(body)
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, name="mock-hasura", daemon=True,
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockHasura":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, *statuses: int):
+        """Answer the next requests with these HTTP statuses, in order (the request is still recorded)."""
+        with self._lock:
+            self._fail_statuses.extend(statuses)
+
+    def operations(self) -> list:
+        """Root field of every request received, in order."""
+        return [re.search(r"{\s*(\w+)", body["query"]).group(1) for body in self.requests]
+
+    def _handle(self, body: dict) -> tuple:
+        with self._lock:
+            self.requests.append(body)
+            self.concurrent += 1
+            self.peak_concurrent = max(self.peak_concurrent, self.concurrent)
+            fail_status = self._fail_statuses.pop(0) if self._fail_statuses else None
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if fail_status is not None:
+                return fail_status, {"error": "mock failure"}
+
+            variables = body.get("variables") or {}
+            if "objects" in variables:
+                returning, error = self._insert(variables["objects"])
+                if error:
+                    return 200, {"errors": [error]}
+                return 200, {"data": {"insert_hotel_rates": {"returning": returning}}}
+            if "object" in variables:
+                returning, error = self._insert([variables["object"]])
+                if error:
+                    return 200, {"errors": [error]}
+                return 200, {"data": {"insert_hotel_rates_one": returning[0]}}
+            return 200, {"data": {"__typename": "query_root"}}
+        finally:
+            with self._lock:
+                self.concurrent -= 1
+
+    def _insert(self, objects: list) -> tuple:
+        """Insert all objects or none, like one Hasura mutation; returns (returning, error)."""
+        if any(obj.get("weekday_rate", 0) < 0 for obj in objects):
+            return None, {
+                "message": 'Check constraint violation. new row violates check constraint "weekday_rate_positive"',
+                "extensions": {"code": "constraint-violation"},
+            }
+
+        with self._lock:
+            keys = [tuple(obj[col] for col in UNIQUE_KEY) for obj in objects]
+            if len(set(keys)) < len(keys) or any(key in self.rates for key in keys):
+                return None, {
+                    "message": 'Uniqueness violation. duplicate key value violates unique constraint "hotel_rates_unique"',
+                    "extensions": {"code": "constraint-violation"},
+                }
+
+            returning = []
+            for key, obj in zip(keys, objects):
+                supplements = [
+                    {"id": str(uuid.uuid4()), **supplement}
+                    for supplement in (obj.get("hotel_rate_meal_supplements") or {}).get("data", [])
+                ]
+                rate = {"id": str(uuid.uuid4()), "hotel_rate_meal_supplements": supplements}
+                self.rates[key] = {**obj, **rate}
+                returning.append(rate)
+            return returning, None
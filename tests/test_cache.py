@@ -0,0 +1,64 @@
+"""
+TTLCache: expiry, eviction, invalidation and single loads per key.
+"""
+
+import threading
+import time
+
+from cache import TTLCache
+
+
+def test_entries_expire_and_evict():
+    cache = TTLCache("test", ttl=0.05, max_entries=2)
+    for key in "abc":
+        cache.get_or_load(key, lambda: key.upper())
+
+    assert cache.get_or_load("c", lambda: "reloaded") == "C"
+    assert cache.get_or_load("a", lambda: "reloaded") == "reloaded"  # evicted
+    time.sleep(0.06)
+    assert cache.get_or_load("c", lambda: "expired") == "expired"
+    assert cache.get_stats()["evictions"] >= 1
+    assert cache.get_stats()["expirations"] >= 1
+
+
+def test_load_overlapping_an_invalidate_is_not_stored():
+    cache = TTLCache("test", ttl=60)
+
+    def loader():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get_or_load("key", loader) == "stale"
+    assert cache.get_or_load("key", lambda: "fresh") == "fresh"
+
+
+def test_one_load_per_key_at_a_time():
+    cache = TTLCache("test", ttl=60)
+    active = 0
+    peak = 0
+    loads = 0
+    lock = threading.Lock()
+
+    def loader():
+        nonlocal active, peak, loads
+        with lock:
+            active += 1
+            loads += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        # Invalidating keeps every load from being stored, so each caller loads in turn
+        cache.invalidate()
+        with lock:
+            active -= 1
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=("key", loader)) for _ in range(16)]
+    # Staggered, so some callers arrive while others are still waiting on an earlier load
+    for thread in threads:
+        thread.start()
+        time.sleep(0.004)
+    for thread in threads:
+        thread.join()
+
+    assert loads == 16
+    assert peak == 1
@@ -0,0 +1,104 @@
+"""
+Validation of filled rate templates: IDs, reference lookups and row order.
+"""
+
+from datetime import date
+
+import polars as pl
+
+from excel_template import TEMPLATE_HEADERS, mark_existing_rates, template_hotel_ids, validate_rate_rows
+
+HOTEL = "0b8f6c1e-4a51-4c3e-9d0e-2f1b7a6c5d41"
+ORG = "6d3c2b1a-0f9e-4d8c-8b7a-6f5e4d3c2b1a"
+ROOM = "9a8b7c6d-5e4f-4a3b-8c2d-1e0f9a8b7c6d"
+SUPPLIER = "1f2e3d4c-5b6a-4978-8a6b-5c4d3e2f1a0b"
+
+HOTELS = [{"hotel_id": HOTEL, "organization_id": ORG, "hotel_name": "Hotel A", "city": "Makkah", "star_rating": 4}]
+ROOM_TYPES = {HOTEL: [{"id": ROOM, "name": "Double", "max_occupancy": 2}]}
+SUPPLIERS = [{"id": SUPPLIER, "name": "Supplier A"}]
+MEAL_TYPES = [{"code": "ROOM_ONLY", "name": "Room Only"}]
+
+
+def template_row(row: int, **overrides) -> dict:
+    values = {col: None for col in TEMPLATE_HEADERS}
+    values.update({
+        "organization_id": ORG,
+        "hotel_id": HOTEL,
+        "hotel_name": "Hotel A",
+        "city": "Makkah",
+        "star_rating": "4",
+        "room_type_id": ROOM,
+        "start_date": f"2026-01-{row:02d}",
+        "end_date": "2026-01-31",
+        "supplier_id_to_fill": SUPPLIER,
+        "occupancy": "DBL",
+        "weekday_rate": "100",
+        "weekend_rate": "120",
+        "currency": "SAR",
+        "rate_type": "subject_to_availability",
+        "included_meal_type_code": "ROOM_ONLY",
+    })
+    values.update(overrides)
+    return {"row": row, **values}
+
+
+def template(*rows: dict) -> pl.DataFrame:
+    return pl.DataFrame(
+        list(rows),
+        schema={"row": pl.Int64, **{col: pl.String for col in TEMPLATE_HEADERS}},
+    )
+
+
+def validate(*rows: dict) -> pl.DataFrame:
+    return validate_rate_rows(template(*rows), HOTELS, ROOM_TYPES, SUPPLIERS, MEAL_TYPES)
+
+
+def test_hotel_details_come_from_the_reference():
+    validated = validate(
+        template_row(2),
+        template_row(3, hotel_name="Hotel A (renamed)", city="Madinah", star_rating="5"),
+    )
+
+    assert validated["error"].to_list() == [None, None]
+    assert validated.select("hotel_name", "city", "star_rating").unique().to_dicts() == [
+        {"hotel_name": "Hotel A", "city": "Makkah", "star_rating": 4}
+    ]
+
+
+def test_uuids_are_written_in_canonical_form():
+    validated = validate(
+        template_row(2, hotel_id=HOTEL.upper(), organization_id=f" {ORG} "),
+        template_row(3, room_type_id=ROOM.replace("-", ""), supplier_id_to_fill=SUPPLIER.replace("-", "").upper()),
+    )
+
+    assert validated["error"].to_list() == [None, None]
+    assert validated.select("organization_id", "hotel_id", "room_type_id", "supplier_id").unique().to_dicts() == [
+        {"organization_id": ORG, "hotel_id": HOTEL, "room_type_id": ROOM, "supplier_id": SUPPLIER}
+    ]
+    assert template_hotel_ids(template(template_row(2, hotel_id=HOTEL.upper()), template_row(3, hotel_id="x"))) == (HOTEL,)
+
+
+def test_invalid_uuids_are_rejected():
+    validated = validate(
+        template_row(2, hotel_id="not-a-uuid"),
+        template_row(3, room_type_id=ROOM[:-1] + "g"),
+        template_row(4, supplier_id_to_fill=SUPPLIER + "0"),
+    )
+
+    assert validated["hotel_id"][0] == "not-a-uuid"
+    assert "hotel_id is not a valid UUID" in validated["error"][0]
+    assert "room_type_id is not a valid UUID" in validated["error"][1]
+    assert "supplier_id_to_fill is not a valid UUID" in validated["error"][2]
+
+
+def test_existing_rates_are_marked_in_row_order():
+    validated = validate(*[template_row(row) for row in range(2, 12)])
+    existing = [{
+        "organization_id": ORG, "hotel_id": HOTEL, "room_type_id": ROOM, "supplier_id": SUPPLIER,
+        "start_date": date(2026, 1, 5), "end_date": date(2026, 1, 31), "occupancy": "DBL",
+    }]
+
+    marked = mark_existing_rates(validated, existing)
+
+    assert marked["row"].to_list() == list(range(2, 12))
+    assert [row for row, error in zip(marked["row"], marked["error"]) if error] == [5]
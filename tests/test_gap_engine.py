@@ -0,0 +1,213 @@
+"""
+The gap report must match the original day-by-day algorithm.
+
+reference_gaps is a compact copy of that algorithm: expand every rate into
+days, then walk the analysis window per hotel and requirement.
+"""
+
+import random
+from datetime import date, timedelta
+
+import polars as pl
+import pytest
+
+from gap_analyzer import (
+    GAP_REPORT_ORDER,
+    CoverageIndex,
+    expand_date_ranges,
+    generate_all_hotel_gaps,
+    patch_hotel_gaps,
+)
+from gap_rules import BOARD_EQUIVALENTS, REQUIRED_OCCUPANCIES, ExclusionSet
+from rates_schema import rates_to_dataframe
+
+START = date(2026, 1, 1)
+END = date(2026, 6, 30)
+BOARDS = [
+    "Room Only", "Breakfast Included", "Sohour Included", "Lunch Included",
+    "Iftar Included", "Dinner Included", "Half Board", "Full Board",
+]
+EXCLUSIONS = [
+    {"start": date(2026, 2, 10), "end": date(2026, 2, 20), "reason": "a"},
+    {"start": date(2026, 2, 18), "end": date(2026, 3, 1), "reason": "overlapping"},
+    {"start": date(2026, 6, 25), "end": date(2026, 7, 31), "reason": "past the window"},
+]
+
+
+def make_rates(seed: int, n_hotels: int = 12, n_rates: int = 150) -> list:
+    rnd = random.Random(seed)
+    hotels = [
+        {
+            "hotel_id": f"h-{i:03d}",
+            "organization_id": f"org-{i % 3}",
+            "hotel_name": f"Hotel {rnd.choice('ABC')}",  # Names repeat, as they do in production
+            "city": rnd.choice(["Makkah", "Madinah"]),
+            "star_rating": rnd.randint(1, 5),
+        }
+        for i in range(n_hotels)
+    ]
+    rates = []
+    for i in range(n_rates):
+        hotel = rnd.choice(hotels)
+        start = START + timedelta(days=rnd.randint(-40, 200))
+        supplier = rnd.randint(0, 4)
+        rates.append({
+            **hotel,
+            "room_type_id": f"rt-{i}",
+            "room_name": "Room",
+            "capacity": rnd.choice([1, 2, 3, 4]),
+            "start_date": start,
+            "end_date": start + timedelta(days=rnd.randint(0, 50)),
+            "board": rnd.choice(BOARDS),
+            "supplier_id": f"s-{supplier}",
+            "supplier_name": f"Supplier {supplier}",
+        })
+    return rates
+
+
+def reference_gaps(rates, start_date, end_date, exclusions, required_boards, required_occupancies,
+                   hotel_filter=None, city_filter=None) -> pl.DataFrame:
+    days = {}
+    hotels = {}
+    for rate in rates:
+        key = tuple(rate[col] for col in ["hotel_id", "organization_id", "hotel_name", "city", "star_rating"])
+        hotels.setdefault(key, set()).add(rate["supplier_name"])
+        day = rate["start_date"]
+        while day <= rate["end_date"]:
+            days.setdefault(rate["hotel_id"], []).append((day, rate["board"], rate["capacity"]))
+            day += timedelta(days=1)
+
+    window = []
+    day = start_date
+    while day <= end_date:
+        if not any(excl["start"] <= day <= excl["end"] for excl in exclusions):
+            window.append(day)
+        day += timedelta(days=1)
+
+    def periods(gap_days):
+        runs = []
+        for day in gap_days:
+            if runs and (day - runs[-1][1]).days == 1:
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+        return runs
+
+    rows = []
+    for (hotel_id, organization_id, hotel_name, city, star_rating), suppliers in hotels.items():
+        if (city_filter and city != city_filter) or (hotel_filter and hotel_id != hotel_filter):
+            continue
+        hotel_days = days.get(hotel_id, [])
+        covered = {d for d, _, _ in hotel_days}
+        checks = [("date", "No availability", lambda d: d not in covered)]
+        for board_name in required_boards:
+            have = {d for d, b, _ in hotel_days if b in BOARD_EQUIVALENTS[board_name]}
+            checks.append(("board", f"Missing: {board_name}", lambda d, have=have: d in covered and d not in have))
+        for cap_name, cap_value in REQUIRED_OCCUPANCIES.items():
+            if cap_name in required_occupancies:
+                have = {d for d, _, c in hotel_days if c == cap_value}
+                checks.append((
+                    "occupancy", f"Missing: {cap_name} ({cap_value})",
+                    lambda d, have=have: d in covered and d not in have,
+                ))
+
+        for gap_type, detail, is_gap in checks:
+            for first, last in periods([d for d in window if is_gap(d)]):
+                rows.append({
+                    "hotel_id": hotel_id,
+                    "organization_id": organization_id,
+                    "hotel_name": hotel_name,
+                    "city": city,
+                    "star_rating": star_rating,
+                    "supplier_name": ", ".join(sorted(suppliers)),
+                    "gap_type": gap_type,
+                    "detail": detail,
+                    "gap_start": first,
+                    "gap_end": last,
+                    "duration_days": (last - first).days + 1,
+                })
+    return pl.DataFrame(rows).sort(GAP_REPORT_ORDER) if rows else None
+
+
+def assert_same_gaps(actual: pl.DataFrame, expected):
+    if expected is None:
+        assert len(actual) == 0
+        return
+    columns = expected.columns
+    assert actual.select(columns).cast(expected.schema).equals(expected)
+
+
+SCENARIOS = [
+    (EXCLUSIONS, ["Room Only", "Breakfast"], ["Double", "Triple", "Quad"], {}),
+    (EXCLUSIONS, list(BOARD_EQUIVALENTS), ["Double"], {"city_filter": "Makkah"}),
+    ([], [], [], {}),
+    ([], ["Lunch", "Dinner"], [], {"hotel_filter": "h-003"}),
+    ([{"start": date(2020, 1, 1), "end": date(2030, 1, 1), "reason": "everything"}], ["Room Only"], ["Quad"], {}),
+]
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("exclusions, boards, occupancies, filters", SCENARIOS)
+def test_matches_reference(seed, exclusions, boards, occupancies, filters):
+    rates = make_rates(seed)
+    expected = reference_gaps(rates, START, END, exclusions, boards, occupancies, **filters)
+    rates_df = rates_to_dataframe(rates)
+
+    assert_same_gaps(
+        generate_all_hotel_gaps(expand_date_ranges(rates_df), START, END, exclusions, boards, occupancies, **filters),
+        expected,
+    )
+    index = CoverageIndex.from_rates(rates_df, START, END)
+    for workers in (1, 3):
+        assert_same_gaps(index.find_gaps(exclusions, boards, occupancies, workers=workers, **filters), expected)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_patch_matches_full_report(seed, monkeypatch):
+    monkeypatch.setattr("gap_analyzer.GAP_PARTITION_MIN_HOTELS", 2)
+    rates = make_rates(seed)
+    params = {
+        "start_date": START,
+        "end_date": END,
+        "exclusions": EXCLUSIONS,
+        "required_boards": ["Room Only", "Breakfast"],
+        "required_occupancies": ["Double", "Triple"],
+    }
+    gaps_df = CoverageIndex.from_rates(rates_to_dataframe(rates), START, END).find_gaps(
+        params["exclusions"], params["required_boards"], params["required_occupancies"],
+    )
+
+    # A new rate from a new supplier, filling part of a gap
+    gap = gaps_df.row(len(gaps_df) // 2, named=True)
+    new_rate = {
+        **next(r for r in rates if r["hotel_id"] == gap["hotel_id"]),
+        "start_date": gap["gap_start"] + timedelta(days=1),
+        "end_date": gap["gap_start"] + timedelta(days=3),
+        "board": "Breakfast Included",
+        "capacity": 2,
+        "supplier_id": "s-new",
+        "supplier_name": "Supplier new",
+    }
+    rates.append(new_rate)
+
+    patched = patch_hotel_gaps(
+        gaps_df, rates_to_dataframe(rates), gap["hotel_id"], new_rate["start_date"], new_rate["end_date"], **params
+    )
+
+    assert_same_gaps(patched, reference_gaps(
+        rates, START, END, params["exclusions"], params["required_boards"], params["required_occupancies"]
+    ))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_subtracting_exclusions_from_a_report(seed):
+    rates = make_rates(seed)
+    boards, occupancies = ["Room Only", "Breakfast"], ["Double", "Triple", "Quad"]
+    gaps_df = CoverageIndex.from_rates(rates_to_dataframe(rates), START, END).find_gaps([], boards, occupancies)
+
+    # Clipping and splitting the report gives the report computed with the exclusions
+    assert_same_gaps(
+        ExclusionSet(EXCLUSIONS).subtract_from_gaps(gaps_df).sort(GAP_REPORT_ORDER),
+        reference_gaps(rates, START, END, EXCLUSIONS, boards, occupancies),
+    )
+    assert ExclusionSet([]).subtract_from_gaps(gaps_df) is gaps_df
@@ -0,0 +1,152 @@
+"""
+Bulk inserts and retries of graphql_client against the in-process mock Hasura.
+"""
+
+import asyncio
+
+import pytest
+
+import graphql_client
+from graphql_client import INSERT_HOTEL_RATE_MUTATION, HasuraClient, insert_hotel_rates, run_sync
+from mock_hasura import MockHasura
+
+
+def rate(i: int, **overrides) -> dict:
+    row = {
+        "organization_id": "org-1",
+        "hotel_id": f"h-{i % 7}",
+        "room_type_id": f"rt-{i}",
+        "supplier_id": "s-1",
+        "start_date": "2026-01-01",
+        "end_date": "2026-01-31",
+        "occupancy": "DBL",
+        "weekday_rate": 100.0,
+        "weekend_rate": 120.0,
+        "currency": "SAR",
+        "rate_type": "subject_to_availability",
+        "included_meal_type_code": "ROOM_ONLY",
+    }
+    row.update(overrides)
+    return row
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(graphql_client, "backoff_delay", lambda attempt: 0)
+
+
+@pytest.fixture
+def hasura():
+    with MockHasura() as mock:
+        yield mock
+
+
+@pytest.fixture
+def client(hasura):
+    client = HasuraClient(url=hasura.url, admin_secret="secret")
+    yield client
+    run_sync(client.aclose())
+
+
+def test_bulk_insert_batches_rows(hasura, client):
+    results = insert_hotel_rates([rate(i) for i in range(120)], batch_size=50, client=client)
+
+    assert [r["status"] for r in results] == ["created"] * 120
+    assert len({r["id"] for r in results}) == 120
+    assert hasura.operations() == ["insert_hotel_rates"] * 3
+    # Batches run concurrently, so they may arrive in any order
+    assert sorted(len(body["variables"]["objects"]) for body in hasura.requests) == [20, 50, 50]
+
+
+def test_bulk_insert_reports_conflicts_per_row(hasura, client):
+    insert_hotel_rates([rate(3)], client=client)
+    rows = [rate(i) for i in range(6)] + [rate(10, weekday_rate=-1)]
+
+    results = insert_hotel_rates(rows, batch_size=10, client=client)
+
+    # The batch fails as a whole, then every row is sent on its own
+    assert hasura.operations()[1:] == ["insert_hotel_rates"] + ["insert_hotel_rates_one"] * 7
+    assert [r["status"] for r in results] == ["created"] * 3 + ["conflict"] + ["created"] * 2 + ["error"]
+    assert "Check constraint" in results[-1]["error"]
+    assert len(hasura.rates) == 6
+
+
+def test_bulk_insert_keeps_supplements_with_their_rate(client):
+    supplements = [
+        {"meal_type_code": "BREAKFAST_INCLUDED", "supplement_price": 20.0},
+        {"meal_type_code": "DINNER_INCLUDED", "supplement_price": 35.0},
+    ]
+    results = insert_hotel_rates([rate(0, meal_supplements=supplements), rate(1)], client=client)
+
+    assert len(results[0]["supplement_ids"]) == 2
+    assert results[1]["supplement_ids"] == []
+
+
+def test_bulk_insert_bounds_concurrent_mutations(client):
+    with MockHasura(delay=0.05) as slow:
+        slow_client = HasuraClient(url=slow.url, admin_secret="secret", max_connections=8)
+        try:
+            results = insert_hotel_rates(
+                [rate(i) for i in range(40)], batch_size=5, max_workers=3, client=slow_client,
+            )
+        finally:
+            run_sync(slow_client.aclose())
+
+    assert [r["status"] for r in results] == ["created"] * 40
+    assert len(slow.requests) == 8
+    assert 1 < slow.peak_concurrent <= 3
+
+
+def test_query_is_retried_on_server_errors(hasura, client):
+    hasura.fail_next(503, 502)
+
+    result = run_sync(client.execute("query Ping { __typename }"))
+
+    assert result == {"data": {"__typename": "query_root"}}
+    assert len(hasura.requests) == 3
+    assert client.get_metrics()["Ping"]["retries"] == 2
+
+
+def test_mutation_is_not_replayed_after_a_server_error(hasura, client):
+    hasura.fail_next(503)
+
+    results = insert_hotel_rates([rate(0)], client=client)
+
+    assert len(hasura.requests) == 1
+    assert results[0]["status"] == "error"
+    assert "may still have been applied" in results[0]["error"]
+
+
+def test_mutation_is_retried_when_it_could_not_connect(hasura):
+    # Nothing listens on the first URL; the retry goes to the mock
+    client = HasuraClient(url="http://127.0.0.1:9/v1/graphql", admin_secret="secret")
+    urls = iter([client.url, hasura.url])
+    post = client._get_http().post
+
+    async def post_next_url(url, **kwargs):
+        return await post(next(urls), **kwargs)
+
+    client._get_http().post = post_next_url
+    try:
+        results = insert_hotel_rates([rate(0)], client=client)
+    finally:
+        run_sync(client.aclose())
+
+    assert results[0]["status"] == "created"
+    assert len(hasura.requests) == 1
+
+
+def test_identical_mutations_are_sent_separately(hasura, client):
+    variables = {"object": graphql_client.build_rate_object(**rate(0))}
+
+    async def insert_twice():
+        return await asyncio.gather(
+            client.execute(INSERT_HOTEL_RATE_MUTATION, variables),
+            client.execute(INSERT_HOTEL_RATE_MUTATION, variables),
+        )
+
+    results = run_sync(insert_twice())
+
+    # Both reach Hasura; the unique index lets one of them through
+    assert len(hasura.requests) == 2
+    assert sorted("errors" in result for result in results) == [False, True]
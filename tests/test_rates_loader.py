@@ -0,0 +1,86 @@
+"""
+The COPY loader (read_rates_csv) must give the same typed frame as rates_to_dataframe.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+
+import pytest
+
+from rates_schema import RATES_SCHEMA, rates_to_dataframe, read_rates_csv
+
+ROWS = [
+    {
+        "hotel_id": "0b8f6c1e-4a51-4c3e-9d0e-2f1b7a6c5d41",
+        "organization_id": "6d3c2b1a-0f9e-4d8c-8b7a-6f5e4d3c2b1a",
+        "hotel_name": 'Hotel "Al Safwa", Tower 2',
+        "city": "Makkah",
+        "star_rating": 5,
+        "room_type_id": "9a8b7c6d-5e4f-4a3b-8c2d-1e0f9a8b7c6d",
+        "room_name": "Deluxe Double",
+        "capacity": 2,
+        "start_date": date(2026, 1, 1),
+        "end_date": date(2026, 3, 31),
+        "board": "Breakfast Included",
+        "supplier_id": "1f2e3d4c-5b6a-4978-8a6b-5c4d3e2f1a0b",
+        "supplier_name": "Supplier A",
+    },
+    {
+        "hotel_id": "2c3d4e5f-6a7b-4c8d-9e0f-1a2b3c4d5e6f",
+        "organization_id": "6d3c2b1a-0f9e-4d8c-8b7a-6f5e4d3c2b1a",
+        "hotel_name": "Dar Al Hijra",
+        "city": None,  # giata_city_id outside Makkah/Madinah
+        "star_rating": None,
+        "room_type_id": "3e4f5a6b-7c8d-4e9f-8a1b-2c3d4e5f6a7b",
+        "room_name": "Quad",
+        "capacity": 4,
+        "start_date": date(2026, 2, 1),
+        "end_date": date(2026, 2, 1),
+        "board": "Room Only",
+        "supplier_id": "4a5b6c7d-8e9f-4a0b-9c1d-2e3f4a5b6c7d",
+        "supplier_name": "Supplier B",
+    },
+]
+
+
+def copy_csv(rows: list) -> bytes:
+    """Rows as COPY ... TO STDOUT WITH (FORMAT csv, HEADER) writes them: NULL is an empty field."""
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(RATES_SCHEMA)
+    for row in rows:
+        writer.writerow(["" if row[col] is None else row[col] for col in RATES_SCHEMA])
+    return out.getvalue().encode()
+
+
+def test_csv_frame_matches_dict_frame():
+    from_csv = read_rates_csv(io.BytesIO(copy_csv(ROWS)))
+    from_dicts = rates_to_dataframe(ROWS)
+
+    assert dict(from_csv.schema) == RATES_SCHEMA
+    assert dict(from_dicts.schema) == RATES_SCHEMA
+    assert from_csv.equals(from_dicts)
+
+
+def test_empty_loads_keep_the_schema():
+    assert dict(read_rates_csv(io.BytesIO(copy_csv([]))).schema) == RATES_SCHEMA
+    assert dict(rates_to_dataframe([]).schema) == RATES_SCHEMA
+
+
+@pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="needs DATABASE_URL")
+def test_copy_loader_matches_dict_loader_on_the_database():
+    from db import copy_hotel_rates, get_hotel_rates
+
+    with tempfile.TemporaryFile() as tmp:
+        copy_hotel_rates(tmp)
+        tmp.seek(0)
+        from_copy = read_rates_csv(tmp)
+
+    from_dicts = rates_to_dataframe(get_hotel_rates())
+
+    # ORDER BY h.name, hr.start_date has ties, so the two queries may order rows differently
+    columns = list(RATES_SCHEMA)
+    assert from_copy.sort(columns).equals(from_dicts.sort(columns))
@@ -0,0 +1,116 @@
+"""
+On-disk snapshots, and a RateStore that starts from one.
+"""
+
+import threading
+from datetime import date
+
+import polars as pl
+import pytest
+
+import rate_store
+from rate_store import RateStore
+from rates_schema import RATES_SCHEMA
+from snapshot import SnapshotStore, records_version
+
+
+def rates_frame(suppliers: list) -> pl.DataFrame:
+    return pl.DataFrame(
+        [
+            {
+                "hotel_id": "h-1",
+                "organization_id": "org-1",
+                "hotel_name": "Hotel A",
+                "city": "Makkah",
+                "star_rating": 4,
+                "room_type_id": f"rt-{supplier}",
+                "room_name": "Double",
+                "capacity": 2,
+                "start_date": date(2026, 1, 1),
+                "end_date": date(2026, 1, 31),
+                "board": "Room Only",
+                "supplier_id": supplier,
+                "supplier_name": f"Supplier {supplier}",
+            }
+            for supplier in suppliers
+        ],
+        schema=RATES_SCHEMA,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path))
+
+
+def test_save_and_load(store, tmp_path):
+    frame = rates_frame(["s-1", "s-2"])
+    store.save("rates", frame, "v1")
+
+    loaded, meta = store.load("rates")
+    assert loaded.equals(frame)
+    assert (meta["version"], meta["rows"]) == ("v1", 2)
+
+    # A new version replaces the data file and leaves no temporary files behind
+    store.save("rates", rates_frame(["s-3"]), "v2")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["rates-v2.arrow", "rates.json"]
+    assert store.load("rates")[1]["version"] == "v2"
+
+
+def test_missing_or_broken_snapshots_load_as_none(store, tmp_path):
+    assert store.load("rates") is None
+
+    (tmp_path / "rates.json").write_text("not json")
+    assert store.load("rates") is None
+
+    store.save("rates", rates_frame(["s-1"]), "v1")
+    (tmp_path / "rates-v1.arrow").unlink()
+    assert store.load("rates") is None
+
+
+def test_records_serve_the_snapshot_then_revalidate(store):
+    old = [{"id": "s-1", "name": "Supplier 1"}]
+    new = old + [{"id": "s-2", "name": "Supplier 2"}]
+    store.save("suppliers", pl.DataFrame(old), records_version(old))
+    changed = threading.Event()
+
+    # A fresh process gets the snapshot, while the fetch runs in the background
+    assert store.records("suppliers", lambda: new, on_change=changed.set) == old
+    assert changed.wait(5)
+    assert store.load("suppliers")[1]["version"] == records_version(new)
+
+    # Later calls fetch
+    assert store.records("suppliers", lambda: new[:1]) == new[:1]
+
+
+def test_rate_store_starts_from_snapshot(store, monkeypatch):
+    database = {"s-1": rates_frame(["s-1"]), "s-2": rates_frame(["s-2"])}
+    checksums = {"s-1": "a", "s-2": "b"}
+
+    def get_rate_checksums():
+        return [{"hotel_id": "h-1", "supplier_id": s, "checksum": c} for s, c in checksums.items()]
+
+    def fetch(pairs=None):
+        suppliers = [s for _, s in pairs] if pairs is not None else list(database)
+        return pl.concat([database[s] for s in suppliers])
+
+    monkeypatch.setattr(rate_store, "get_rate_checksums", get_rate_checksums)
+    monkeypatch.setattr(RateStore, "_fetch", staticmethod(fetch))
+
+    first = RateStore(snapshots=store)
+    first.load()
+
+    # A restarted process restores the frame without touching the database...
+    database["s-2"] = rates_frame(["s-2"]).with_columns(pl.lit(3, dtype=pl.Int8).alias("capacity"))
+    checksums["s-2"] = "c"
+    revalidated = threading.Event()
+    sync = RateStore.sync
+    monkeypatch.setattr(RateStore, "sync", lambda self: revalidated.set())
+    restarted = RateStore(snapshots=store)
+    assert restarted.load().equals(first.frame)
+    assert restarted.version == first.version
+    assert revalidated.wait(5)
+
+    # ...and the delta sync then refetches only the changed group
+    assert sync(restarted) == {"changed": 1, "removed": 0, "rows_fetched": 1}
+    assert sorted(restarted.frame["capacity"].to_list()) == [2, 3]
@@ -0,0 +1,156 @@
+"""
+Materializes gap reports for the standard presets.
+
+The dashboard runs a GapMaterializer on a background thread of its own
+process, following the rates it has loaded. Reports live in SNAPSHOT_DIR,
+which is local to a process's filesystem, so the dashboard does not rely
+on a separate worker process (e.g. a worker dyno, which has its own
+ephemeral disk).
+
+This module can also run standalone, next to a dashboard on the same host
+or volume: python worker.py [--once] [--interval 900]. Each cycle then
+delta-syncs its own rate store (see rate_store.py) first.
+
+Either way, a cycle recomputes the gap report of every preset in
+gap_store.GAP_PRESETS only when the rates or the preset window changed
+since the last cycle.
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Optional
+
+import polars as pl
+
+from gap_store import GapStore, compute_preset_gaps, preset_window
+from rate_store import RateStore
+from snapshot import SnapshotStore
+
+WORKER_INTERVAL = float(os.getenv("GAP_WORKER_INTERVAL", "900"))
+
+
+def materialize(
+    rates_df: pl.DataFrame,
+    rates_version: str,
+    gap_store: GapStore,
+    start_date: date,
+    end_date: date,
+) -> dict:
+    """
+    Store a fresh report for every preset, computed from rates_df.
+
+    Returns:
+        preset name -> number of gaps
+    """
+    reports = compute_preset_gaps(rates_df, start_date, end_date)
+    for name, gaps_df in reports.items():
+        gap_store.put(name, gaps_df, rates_version, start_date, end_date)
+    return {name: len(gaps_df) for name, gaps_df in reports.items()}
+
+
+class GapMaterializer:
+    """
+    Keeps the preset reports of a GapStore in step with a RateStore.
+
+    With sync=True each cycle delta-syncs the rate store first (standalone
+    worker). With sync=False it follows a store that its owner syncs (the
+    dashboard), and only materializes what that store has loaded.
+    """
+
+    def __init__(
+        self,
+        rate_store: RateStore,
+        gap_store: GapStore,
+        interval: float = WORKER_INTERVAL,
+        sync: bool = False,
+    ):
+        self.rate_store = rate_store
+        self.gap_store = gap_store
+        self.interval = interval
+        self.sync = sync
+        self.last_run = None
+        self._last_key = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def run_once(self) -> Optional[dict]:
+        """
+        Run one cycle.
+
+        Returns:
+            preset name -> number of gaps, or None when the reports were
+            already up to date (or no rates are loaded yet)
+        """
+        if self.sync:
+            self.rate_store.sync()
+        rates_df, rates_version = self.rate_store.current()
+        if rates_df is None:
+            return None
+
+        # Reports only change with the rates or the window (i.e. the date)
+        window = preset_window()
+        if (rates_version, window) == self._last_key:
+            return None
+        counts = materialize(rates_df, rates_version, self.gap_store, *window)
+        self._last_key = (rates_version, window)
+        self.last_run = datetime.now()
+        return counts
+
+    def start(self):
+        """Run cycles on a daemon thread, every interval seconds or when woken by request_run."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="gap-materializer", daemon=True)
+        self._thread.start()
+
+    def request_run(self):
+        """Ask the thread to run a cycle now, e.g. after the rates were refreshed."""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._cycle()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _cycle(self):
+        started = time.perf_counter()
+        try:
+            counts = self.run_once()
+        except Exception as e:
+            # Keep going across database hiccups; the next cycle retries
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} gap worker error: {e}", flush=True)
+            return
+        if counts is not None:
+            summary = ", ".join(f"{name}: {count}" for name, count in counts.items())
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} materialized gaps ({summary}) "
+                  f"in {time.perf_counter() - started:.1f}s", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialize preset gap reports")
+    parser.add_argument("--once", action="store_true", help="Run one cycle and exit")
+    parser.add_argument(
+        "--interval", type=float, default=WORKER_INTERVAL,
+        help="Seconds between cycles (default GAP_WORKER_INTERVAL or 900)",
+    )
+    args = parser.parse_args()
+
+    snapshots = SnapshotStore()
+    materializer = GapMaterializer(
+        RateStore(snapshots=snapshots), GapStore(snapshots), interval=args.interval, sync=True,
+    )
+
+    if args.once:
+        materializer._cycle()
+        return
+    materializer._run()
+
+
+if __name__ == "__main__":
+    main()